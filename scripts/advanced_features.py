@@ -12,18 +12,27 @@ Features / 功能:
 
 Usage / 用法:
     python scripts/advanced_features.py diarize audio.mp3 --output result.md
+    python scripts/advanced_features.py diarize audio_list.txt --batch --output results.json
     python scripts/advanced_features.py extract-tables document.pdf
+    python scripts/advanced_features.py coverage document.pdf --extract-tables ./output
 """
 
+import io
 import os
 import sys
+from contextlib import contextmanager
+from itertools import accumulate, groupby
+from operator import itemgetter
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
 
 # ============================================================
 # Speaker Diarization / 说话人分离
 # ============================================================
 
+# pyannote models run on 16kHz mono / pyannote模型使用16kHz单声道
+DIARIZATION_SAMPLE_RATE = 16000
+
 def check_speaker_diarization_deps() -> Tuple[bool, str]:
     """Check speaker diarization dependencies / 检查说话人分离依赖"""
     try:
@@ -38,30 +47,19 @@ def check_speaker_diarization_deps() -> Tuple[bool, str]:
     except ImportError as e:
         return False, f"Missing dependency: {e}"
 
-def run_speaker_diarization(audio_path: str, num_speakers: Optional[int] = None) -> List[Dict]:
-    """
-    Run speaker diarization / 运行说话人分离
-    
-    Args / 参数:
-        audio_path: Audio file path / 音频文件路径
-        num_speakers: Number of speakers (optional, auto-detect) / 说话人数量（可选，自动检测）
-    
-    Returns / 返回:
-        Speaker segments list [{speaker, start, end}, ...] / 说话人片段列表
-    """
-    ok, msg = check_speaker_diarization_deps()
-    if not ok:
-        print(f"[X] Speaker diarization not available: {msg}")
-        print("\nPlease follow these steps:")
-        print("1. Tell AI: 'Please install speaker diarization feature'")
-        print("2. Follow the guide to get HuggingFace Token")
-        return []
-    
+# Loaded pipelines keyed by (token, use_cuda) / 已加载的管线缓存
+_PIPELINE_CACHE: Dict[Tuple[Optional[str], bool], object] = {}
+
+def _load_diarization_pipeline(token: Optional[str]):
+    """Load the diarization pipeline once per process / 每个进程只加载一次说话人分离管线"""
     from pyannote.audio import Pipeline
     import torch
-    import soundfile as sf  # Use soundfile to avoid torchcodec issues
     
-    token = os.environ.get('HUGGINGFACE_TOKEN') or os.environ.get('HF_TOKEN')
+    use_cuda = torch.cuda.is_available()
+    key = (token, use_cuda)
+    pipeline = _PIPELINE_CACHE.get(key)
+    if pipeline is not None:
+        return pipeline
     
     print("Loading speaker diarization model...")
     
@@ -71,33 +69,76 @@ def run_speaker_diarization(audio_path: str, num_speakers: Optional[int] = None)
         token=token
     )
     
-    if torch.cuda.is_available():
+    if use_cuda:
         pipeline.to(torch.device("cuda"))
         print("[OK] Using GPU acceleration")
     
+    _PIPELINE_CACHE[key] = pipeline
+    return pipeline
+
+def _run_pipeline(pipeline, audio, num_speakers: Optional[int] = None):
+    """Run pipeline under FP16 autocast on CUDA, retrying in FP32 on failure / 在CUDA上以FP16运行，失败时回退FP32"""
+    import torch
+    
+    kwargs = {'num_speakers': num_speakers} if num_speakers else {}
+    
+    if not torch.cuda.is_available():
+        return pipeline(audio, **kwargs)
+    
+    try:
+        with torch.autocast(device_type="cuda", dtype=torch.float16):
+            return pipeline(audio, **kwargs)
+    except RuntimeError as e:
+        print(f"[WARN] FP16 inference failed, retrying in FP32: {e}")
+        return pipeline(audio, **kwargs)
+
+def _prepare_diarization():
+    """Check dependencies and load the pipeline, or None if unavailable / 检查依赖并加载管线，不可用时返回None"""
+    ok, msg = check_speaker_diarization_deps()
+    if not ok:
+        print(f"[X] Speaker diarization not available: {msg}")
+        print("\nPlease follow these steps:")
+        print("1. Tell AI: 'Please install speaker diarization feature'")
+        print("2. Follow the guide to get HuggingFace Token")
+        return None
+    
+    token = os.environ.get('HUGGINGFACE_TOKEN') or os.environ.get('HF_TOKEN')
+    return _load_diarization_pipeline(token)
+
+def _diarize_file(pipeline, audio_path: str, num_speakers: Optional[int] = None) -> List[Dict]:
+    """Diarize one audio file with a loaded pipeline / 使用已加载的管线处理单个音频"""
+    import numpy as np
+    import torch
+    import soundfile as sf  # Use soundfile to avoid torchcodec issues
+    
     print(f"Analyzing audio: {audio_path}")
     
     # Load audio using soundfile to avoid torchcodec compatibility issues
     try:
-        data, sample_rate = sf.read(audio_path)
-        waveform = torch.from_numpy(data).float()
-        if len(waveform.shape) == 1:
-            waveform = waveform.unsqueeze(0)
-        else:
-            waveform = waveform.T
+        # Read as float32 (frames, channels), then one copy to contiguous (channels, frames)
+        data, sample_rate = sf.read(audio_path, dtype='float32', always_2d=True)
+        waveform = torch.from_numpy(np.ascontiguousarray(data.T))
+        
+        # Downmix and resample once up front instead of per crop inside pyannote
+        # 预先一次性混音和重采样，避免pyannote对每个片段重复处理
+        if waveform.shape[0] > 1 or sample_rate != DIARIZATION_SAMPLE_RATE:
+            if torch.cuda.is_available():
+                waveform = waveform.cuda()
+            if waveform.shape[0] > 1:
+                waveform = waveform.mean(dim=0, keepdim=True)
+            if sample_rate != DIARIZATION_SAMPLE_RATE:
+                import torchaudio.functional as AF
+                waveform = AF.resample(waveform, sample_rate, DIARIZATION_SAMPLE_RATE)
+                sample_rate = DIARIZATION_SAMPLE_RATE
+            waveform = waveform.cpu()
+        
         audio_in_memory = {"waveform": waveform, "sample_rate": sample_rate}
         
-        if num_speakers:
-            result = pipeline(audio_in_memory, num_speakers=num_speakers)
-        else:
-            result = pipeline(audio_in_memory)
+        result = _run_pipeline(pipeline, audio_in_memory, num_speakers)
     except Exception as e:
         print(f"[WARN] Memory loading failed, trying file path: {e}")
         # Fallback to file path
-        if num_speakers:
-            result = pipeline(audio_path, num_speakers=num_speakers)
-        else:
-            result = pipeline(audio_path)
+        result = _run_pipeline(pipeline, audio_path, num_speakers)
     
     # pyannote 3.x: access Annotation via speaker_diarization attribute
     diarization = result.speaker_diarization if hasattr(result, 'speaker_diarization') else result
@@ -114,6 +155,99 @@ def run_speaker_diarization(audio_path: str, num_speakers: Optional[int] = None)
     print(f"[OK] Identified {unique_speakers} speakers")
     return segments
 
+def run_speaker_diarization(audio_path: str, num_speakers: Optional[int] = None) -> List[Dict]:
+    """
+    Run speaker diarization / 运行说话人分离
+    
+    Args / 参数:
+        audio_path: Audio file path / 音频文件路径
+        num_speakers: Number of speakers (optional, auto-detect) / 说话人数量（可选，自动检测）
+    
+    Returns / 返回:
+        Speaker segments list [{speaker, start, end}, ...] / 说话人片段列表
+    """
+    pipeline = _prepare_diarization()
+    if pipeline is None:
+        return []
+    
+    return _diarize_file(pipeline, audio_path, num_speakers)
+
+def run_speaker_diarization_batch(audio_paths: List[str], num_speakers: Optional[int] = None) -> List[List[Dict]]:
+    """
+    Run speaker diarization on many files with one loaded pipeline / 使用同一管线批量运行说话人分离
+    
+    Args / 参数:
+        audio_paths: Audio file paths / 音频文件路径列表
+        num_speakers: Number of speakers (optional, auto-detect) / 说话人数量（可选，自动检测）
+    
+    Returns / 返回:
+        Segments list per file, in input order (empty on failure) / 每个文件的片段列表，按输入顺序（失败为空）
+    """
+    pipeline = _prepare_diarization()
+    if pipeline is None:
+        return [[] for _ in audio_paths]
+    
+    results = []
+    for i, audio_path in enumerate(audio_paths):
+        print(f"\n[{i+1}/{len(audio_paths)}]", end=" ")
+        try:
+            results.append(_diarize_file(pipeline, audio_path, num_speakers))
+        except Exception as e:
+            print(f"[X] Diarization failed: {e}")
+            results.append([])
+    
+    return results
+
+# ============================================================
+# Page-parallel helpers / 页面并行辅助
+# ============================================================
+
+def _split_pages(page_count: int, max_workers: Optional[int] = None) -> List[range]:
+    """Split page indices into contiguous ranges, one per worker / 将页码划分为连续区间，每个进程一段"""
+    if page_count <= 0:
+        return []
+    workers = max(1, min(max_workers or os.cpu_count() or 1, page_count))
+    step = -(-page_count // workers)
+    return [range(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+@contextmanager
+def _open_pdf(source):
+    """Yield an open document from a path or Document, closing only what was opened here / 打开文档，仅关闭此处打开的文档"""
+    import fitz
+    
+    if isinstance(source, fitz.Document):
+        yield source
+        return
+    
+    doc = fitz.open(source)
+    try:
+        yield doc
+    finally:
+        doc.close()
+
+def _map_page_ranges(func, doc, max_workers: Optional[int] = None, initializer=None) -> List:
+    """
+    Run func(source, pages) over page ranges in a process pool / 在进程池中按页段并行执行
+    
+    A single range reuses the already open document; pool workers reopen it by path.
+    Results are flattened in page order. If given, initializer(workers) runs
+    once in each pool process with the pool size.
+    单个页段直接复用已打开的文档；进程池中各进程按路径重新打开。结果按页码顺序合并。
+    若提供 initializer，则在每个池进程中以进程池大小调用一次 initializer(workers)。
+    """
+    ranges = _split_pages(len(doc), max_workers)
+    # In-memory documents have no path to reopen / 内存文档无法按路径重新打开
+    if len(ranges) <= 1 or not doc.name:
+        chunks = [func(doc, pages) for pages in ranges]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        from functools import partial
+        initargs = (len(ranges),) if initializer else ()
+        with ProcessPoolExecutor(max_workers=len(ranges), initializer=initializer,
+                                 initargs=initargs) as executor:
+            chunks = list(executor.map(partial(func, doc.name), ranges))
+    return [item for chunk in chunks for item in chunk]
+
 # ============================================================
 # Table Extraction / 表格提取
 # ============================================================
@@ -126,13 +260,108 @@ def check_table_extraction_deps() -> Tuple[bool, str]:
     except ImportError:
         return False, "Missing rapid-table dependency"
 
-def extract_tables_from_pdf(pdf_path: str, output_dir: str = './output') -> List[str]:
+# Table page pre-filter thresholds / 表格页预筛选阈值
+TABLE_MIN_RULE_SEGMENTS = 4  # Stroked line/rect segments suggesting ruled cells / 表格线段数
+TABLE_MIN_ALIGNED_ROWS = 3   # Rows with 2+ side-by-side text lines / 多列文本行数
+
+HTML_WRITE_BUFFER = 1 << 20  # 1MB write buffer for table HTML / 表格HTML写入缓冲区
+
+# Each worker loads its own table model, so cap them like OCR workers
+# 每个工作进程各自加载表格模型，因此与OCR一样限制进程数
+TABLE_WORKERS = min(os.cpu_count() or 1, 4)
+
+_TABLE_ENGINE = None
+_TABLE_THREADS = None  # ORT intra-op threads, None for the default / ORT算子内线程数，None为默认
+
+def _share_table_cpus(workers: int):
+    """Pool initializer: give this worker's table session its share of the cores / 进程池初始化：为本进程的表格会话分配核心份额"""
+    global _TABLE_THREADS
+    _TABLE_THREADS = max(1, (os.cpu_count() or 1) // workers)
+
+def _get_table_engine():
+    """Get the per-process RapidTable engine / 获取进程内共享的RapidTable引擎"""
+    global _TABLE_ENGINE
+    if _TABLE_ENGINE is None:
+        from rapid_table import RapidTable
+        if _TABLE_THREADS is None:
+            _TABLE_ENGINE = RapidTable()
+        else:
+            try:
+                _TABLE_ENGINE = RapidTable(intra_op_num_threads=_TABLE_THREADS, inter_op_num_threads=1)
+            except TypeError:
+                # Older rapid_table without keyword config / 旧版本不支持关键字配置
+                _TABLE_ENGINE = RapidTable()
+    return _TABLE_ENGINE
+
+def _page_may_have_table(page) -> bool:
+    """Cheap check for ruled lines, column-aligned text or scanned content / 快速检查是否有表格线、多列对齐文本或扫描内容"""
+    segments = sum(
+        len(d["items"]) for d in page.get_drawings() if "s" in (d.get("type") or "")
+    )
+    if segments >= TABLE_MIN_RULE_SEGMENTS:
+        return True
+    
+    # "words" yields (x0, y0, x1, y1, word, block_no, line_no, word_no) tuples
+    words = page.get_text("words")
+    
+    # Scanned/image-only pages have neither drawings nor words; a table there is
+    # only visible to the model / 扫描或纯图片页面既无线段也无文字，其中的表格只有模型能识别
+    if not words:
+        return bool(page.get_images())
+    
+    # Borderless tables: several rows holding 2+ separate text lines at the same height
+    # 无框表格：多行在同一高度上有两条以上独立文本行
+    rows = {}
+    for word in words:
+        rows.setdefault(round(word[1] / 2), set()).add((word[5], word[6]))
+    aligned_rows = sum(1 for lines in rows.values() if len(lines) >= 2)
+    return aligned_rows >= TABLE_MIN_ALIGNED_ROWS
+
+def _scan_tables(source, pages: range) -> List[Optional[str]]:
+    """Detect tables on a range of pages, returning HTML or None per page / 检测页段中的表格"""
+    import fitz
+    import cv2
+    import numpy as np
+    
+    tables = []
+    
+    with _open_pdf(source) as doc:
+        for page_num in pages:
+            page = doc[page_num]
+            
+            if not _page_may_have_table(page):
+                tables.append(None)
+                continue
+            
+            # ~144 DPI single-channel render is enough for table structure
+            # 约144 DPI单通道渲染足以识别表格结构
+            mat = fitz.Matrix(2, 2)
+            pix = page.get_pixmap(matrix=mat, colorspace=fitz.csGRAY, alpha=False)
+            
+            img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+            # RapidTable is OpenCV-based and expects 3-channel BGR; cvtColor makes the
+            # one contiguous, writeable copy so the engine never copies the read-only buffer
+            # RapidTable基于OpenCV，需要三通道BGR；cvtColor生成唯一一份连续可写副本
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+            
+            # Engine is loaded on the first page that passes the filter, never
+            # for a worker whose pages are all filtered out
+            # 引擎在首个通过筛选的页面时才加载，页面全部被筛掉的工作进程不会加载
+            result, _ = _get_table_engine()(img)
+            tables.append(result or None)
+    
+    return tables
+
+def extract_tables_from_pdf(pdf_path: Optional[str] = None, output_dir: str = './output',
+                            max_workers: Optional[int] = None, doc=None) -> List[str]:
     """
     Extract tables from PDF / 从PDF提取表格
     
     Args / 参数:
         pdf_path: PDF file path / PDF文件路径
         output_dir: Output directory / 输出目录
+        max_workers: Worker processes (default: TABLE_WORKERS) / 工作进程数（默认TABLE_WORKERS）
+        doc: Already open fitz.Document, used instead of pdf_path / 已打开的文档，优先于pdf_path
     
     Returns / 返回:
         List of extracted table HTML file paths / 提取的表格HTML文件路径列表
@@ -143,45 +372,29 @@ def extract_tables_from_pdf(pdf_path: str, output_dir: str = './output') -> List
         print("Tell AI: 'Please install table extraction dependencies'")
         return []
     
-    import fitz
-    from rapid_table import RapidTable
-    import cv2
-    import numpy as np
-    
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     
-    pdf_name = Path(pdf_path).stem
-    table_engine = RapidTable()
-    
-    print(f"Extracting tables from: {pdf_path}")
+    with _open_pdf(doc if doc is not None else pdf_path) as pdf:
+        pdf_name = Path(pdf.name or pdf_path or "document").stem
+        
+        print(f"Extracting tables from: {pdf.name or pdf_path}")
+        
+        tables = _map_page_ranges(_scan_tables, pdf, max_workers or TABLE_WORKERS,
+                                  initializer=_share_table_cpus)
     
-    doc = fitz.open(pdf_path)
     extracted_files = []
     table_count = 0
     
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        
-        mat = fitz.Matrix(2, 2)
-        pix = page.get_pixmap(matrix=mat)
-        
-        img_array = np.frombuffer(pix.samples, dtype=np.uint8)
-        img = img_array.reshape(pix.height, pix.width, pix.n)
-        if pix.n == 4:
-            img = cv2.cvtColor(img, cv2.COLOR_RGBA2RGB)
-        
-        result, _ = table_engine(img)
-        
+    for page_num, result in enumerate(tables):
         if result:
             table_count += 1
             html_file = output_path / f"{pdf_name}_table_{page_num+1}_{table_count}.html"
-            html_file.write_text(result, encoding='utf-8')
+            with open(html_file, 'w', encoding='utf-8', buffering=HTML_WRITE_BUFFER) as f:
+                f.write(result)
             extracted_files.append(str(html_file))
             print(f"  [OK] Page {page_num+1}: extracted 1 table")
     
-    doc.close()
-    
     if table_count == 0:
         print("  No tables detected")
     else:
@@ -189,39 +402,122 @@ def extract_tables_from_pdf(pdf_path: str, output_dir: str = './output') -> List
     
     return extracted_files
 
-def table_html_to_markdown(html_content: str) -> str:
-    """Convert table HTML to Markdown / 将表格HTML转换为Markdown"""
+def _table_rows_lxml(html_content: str) -> Optional[Iterator[List[str]]]:
+    """Lazily yield first table's cell texts with lxml (libxml2) / 使用lxml逐行解析表格单元格文本"""
+    import lxml.html
+    from lxml.etree import ParserError
+    
     try:
-        from bs4 import BeautifulSoup
-    except ImportError:
-        return html_content
+        root = lxml.html.fromstring(html_content)
+    except (ParserError, ValueError):
+        return None
+    
+    # iter() includes the root itself, for bare <table> fragments
+    table = next(root.iter('table'), None)
+    if table is None:
+        return None
+    
+    # Strip each text node and join them, as bs4's get_text(strip=True) does,
+    # so both parsers render cells identically
+    # 逐个文本节点去除空白后拼接，与 bs4 的 get_text(strip=True) 一致，两种解析器输出相同
+    return (
+        [''.join(text.strip() for text in cell.itertext()) for cell in row.xpath('.//th|.//td')]
+        for row in table.iter('tr')
+    )
+
+def _table_rows_bs4(html_content: str) -> Optional[Iterator[List[str]]]:
+    """Lazily yield first table's cell texts with BeautifulSoup / 使用BeautifulSoup逐行解析表格单元格文本"""
+    from bs4 import BeautifulSoup
     
     soup = BeautifulSoup(html_content, 'html.parser')
     table = soup.find('table')
-    
     if not table:
-        return html_content
+        return None
+    
+    return (
+        [cell.get_text(strip=True) for cell in row.find_all(['th', 'td'])]
+        for row in table.find_all('tr')
+    )
+
+def table_html_to_markdown(html_content: str) -> str:
+    """Convert table HTML to Markdown / 将表格HTML转换为Markdown"""
+    try:
+        rows = _table_rows_lxml(html_content)
+    except ImportError:
+        try:
+            rows = _table_rows_bs4(html_content)
+        except ImportError:
+            return html_content
     
-    rows = table.find_all('tr')
-    if not rows:
+    if rows is None:
         return html_content
     
-    md_lines = []
+    buf = io.StringIO()
     
-    for i, row in enumerate(rows):
-        cells = row.find_all(['th', 'td'])
-        cell_texts = [cell.get_text(strip=True) for cell in cells]
-        md_lines.append('| ' + ' | '.join(cell_texts) + ' |')
+    for i, cell_texts in enumerate(rows):
+        buf.write('| ' + ' | '.join(cell_texts) + ' |\n')
         
         if i == 0:
-            md_lines.append('| ' + ' | '.join(['---'] * len(cells)) + ' |')
+            buf.write('| ' + ' | '.join(['---'] * len(cell_texts)) + ' |\n')
     
-    return '\n'.join(md_lines)
+    # No <tr> rows / 没有表格行
+    if not buf.tell():
+        return html_content
+    
+    return buf.getvalue().rstrip('\n')
 
 # ============================================================
 # Reading Order optimization / 阅读顺序优化
 # ============================================================
 
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# Compiled reading-order kernel, built on first use: importing numba is slow and
+# only reading-order sorting needs it (False when numba is not installed)
+# 阅读顺序编译内核，首次使用时构建：导入 numba 较慢且仅阅读顺序排序需要（未安装 numba 时为 False）
+_READING_ORDER_KERNEL = None
+
+def _reading_order_lexsort(y0, x0, line_threshold: float):
+    """Return reading-order permutation of blocks via a single lexsort / 通过一次lexsort返回阅读顺序排列"""
+    # Stable sort by (y0, x0) / 按 (y0, x0) 稳定排序
+    order = np.lexsort((x0, y0))
+    # A new line starts wherever the y gap exceeds the threshold / y间距超过阈值即为新行
+    breaks = np.abs(np.diff(y0[order])) > line_threshold
+    line_ids = np.concatenate(([0], np.cumsum(breaks)))
+    return order[np.lexsort((x0[order], line_ids))]
+
+def _reading_order_kernel(y0, x0, line_threshold):
+    """Return reading-order permutation of blocks (compiled with numba) / 返回阅读顺序排列（由numba编译）"""
+    # Stable sort by (y0, x0) / 按 (y0, x0) 稳定排序
+    by_x = np.argsort(x0, kind='mergesort')
+    order = by_x[np.argsort(y0[by_x], kind='mergesort')]
+    
+    n = order.shape[0]
+    perm = np.empty(n, dtype=np.int64)
+    lo = 0
+    for i in range(1, n + 1):
+        if i == n or abs(y0[order[i]] - y0[order[i - 1]]) > line_threshold:
+            line = order[lo:i]
+            perm[lo:i] = line[np.argsort(x0[line], kind='mergesort')]
+            lo = i
+    return perm
+
+def _get_reading_order_kernel():
+    """Compile the reading-order kernel once, None without numba / 编译一次阅读顺序内核，无numba时返回None"""
+    global _READING_ORDER_KERNEL
+    if _READING_ORDER_KERNEL is None:
+        try:
+            from numba import njit
+        except ImportError:
+            _READING_ORDER_KERNEL = False
+        else:
+            _READING_ORDER_KERNEL = njit(cache=True)(_reading_order_kernel)
+    return _READING_ORDER_KERNEL or None
+
 def sort_by_reading_order(blocks: List[Dict]) -> List[Dict]:
     """
     Sort text blocks by reading order / 按阅读顺序排序文本块
@@ -237,30 +533,30 @@ def sort_by_reading_order(blocks: List[Dict]) -> List[Dict]:
     
     line_threshold = 10
     
-    lines = []
-    current_line = []
-    last_y = None
-    
-    sorted_blocks = sorted(blocks, key=lambda b: (b.get('y0', 0), b.get('x0', 0)))
-    
-    for block in sorted_blocks:
-        y = block.get('y0', 0)
-        
-        if last_y is None or abs(y - last_y) <= line_threshold:
-            current_line.append(block)
+    if HAS_NUMPY:
+        n = len(blocks)
+        y0 = np.fromiter((b.get('y0', 0) for b in blocks), dtype=np.float64, count=n)
+        x0 = np.fromiter((b.get('x0', 0) for b in blocks), dtype=np.float64, count=n)
+        kernel = _get_reading_order_kernel()
+        if kernel is not None:
+            perm = kernel(y0, x0, float(line_threshold))
         else:
-            if current_line:
-                lines.append(sorted(current_line, key=lambda b: b.get('x0', 0)))
-            current_line = [block]
-        
-        last_y = y
-    
-    if current_line:
-        lines.append(sorted(current_line, key=lambda b: b.get('x0', 0)))
+            perm = _reading_order_lexsort(y0, x0, line_threshold)
+        return [blocks[i] for i in perm]
+    
+    # Precompute (y0, x0, index) keys once; the index keeps ties stable
+    # 预先计算 (y0, x0, 序号) 键，序号保证相同键时顺序稳定
+    keys = sorted((b.get('y0', 0), b.get('x0', 0), i) for i, b in enumerate(blocks))
+    ys = [k[0] for k in keys]
+    line_ids = accumulate(
+        (abs(y - last_y) > line_threshold for last_y, y in zip(ys, ys[1:])),
+        initial=0
+    )
     
+    get_x = itemgetter(1)
     result = []
-    for line in lines:
-        result.extend(line)
+    for _, line in groupby(zip(line_ids, keys), key=itemgetter(0)):
+        result.extend(blocks[k[2]] for k in sorted((k for _, k in line), key=get_x))
     
     return result
 
@@ -268,19 +564,47 @@ def sort_by_reading_order(blocks: List[Dict]) -> List[Dict]:
 # Text Coverage calculation / 文本覆盖率计算
 # ============================================================
 
-def calculate_text_coverage(pdf_path: str) -> Dict:
+def _scan_text_area(source, pages: range) -> List[Tuple[float, float]]:
+    """Compute (text_area, page_area) for a range of pages / 计算页段的文本面积与页面面积"""
+    import numpy as np
+    
+    areas = []
+    
+    with _open_pdf(source) as doc:
+        for page_num in pages:
+            page = doc[page_num]
+            
+            rect = page.rect
+            page_area = rect.width * rect.height
+            
+            # Pages without font resources (pure scans) cannot hold text; skip extraction
+            # 无字体资源的页面（纯扫描）不可能有文本，跳过提取
+            if not page.get_fonts():
+                areas.append((0.0, page_area))
+                continue
+            
+            # "blocks" yields flat (x0, y0, x1, y1, text, block_no, block_type) tuples
+            bboxes = [block[:4] for block in page.get_text("blocks") if block[6] == 0]
+            boxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+            text_area = float(((boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])).sum())
+            
+            areas.append((text_area, page_area))
+    
+    return areas
+
+def calculate_text_coverage(pdf_path: Optional[str] = None, max_workers: Optional[int] = None,
+                            doc=None) -> Dict:
     """
     Calculate PDF text coverage / 计算PDF文本覆盖率
     
     Args / 参数:
         pdf_path: PDF file path / PDF文件路径
+        max_workers: Worker processes (default: CPU count) / 工作进程数（默认CPU核数）
+        doc: Already open fitz.Document, used instead of pdf_path / 已打开的文档，优先于pdf_path
     
     Returns / 返回:
         {pages: [...], average_coverage: float, needs_ocr: bool}
     """
-    import fitz
-    
-    doc = fitz.open(pdf_path)
     results = {
         'pages': [],
         'total_text_area': 0,
@@ -289,18 +613,10 @@ def calculate_text_coverage(pdf_path: str) -> Dict:
         'needs_ocr': False
     }
     
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        
-        rect = page.rect
-        page_area = rect.width * rect.height
-        
-        text_area = 0
-        for block in page.get_text("dict")["blocks"]:
-            if block["type"] == 0:
-                bbox = block["bbox"]
-                text_area += (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
-        
+    with _open_pdf(doc if doc is not None else pdf_path) as pdf:
+        areas = _map_page_ranges(_scan_text_area, pdf, max_workers)
+    
+    for page_num, (text_area, page_area) in enumerate(areas):
         coverage = (text_area / page_area * 100) if page_area > 0 else 0
         
         results['pages'].append({
@@ -310,8 +626,6 @@ def calculate_text_coverage(pdf_path: str) -> Dict:
         results['total_text_area'] += text_area
         results['total_page_area'] += page_area
     
-    doc.close()
-    
     if results['total_page_area'] > 0:
         results['average_coverage'] = round(
             results['total_text_area'] / results['total_page_area'] * 100, 2
@@ -337,6 +651,8 @@ def main():
     diarize_parser.add_argument("audio", help="Audio file path")
     diarize_parser.add_argument("--speakers", "-n", type=int, help="Number of speakers")
     diarize_parser.add_argument("--output", "-o", help="Output file")
+    diarize_parser.add_argument("--batch", action="store_true",
+                                help="Treat audio as a text file listing one audio path per line")
     
     # Table extraction
     table_parser = subparsers.add_parser("extract-tables", help="Table extraction")
@@ -346,11 +662,22 @@ def main():
     # Text coverage
     coverage_parser = subparsers.add_parser("coverage", help="Calculate text coverage")
     coverage_parser.add_argument("pdf", help="PDF file path")
+    coverage_parser.add_argument("--extract-tables", metavar="DIR",
+                                 help="Also extract tables to DIR, reusing the opened PDF")
     
     args = parser.parse_args()
     
     if args.command == "diarize":
-        segments = run_speaker_diarization(args.audio, args.speakers)
+        if args.batch:
+            lines = Path(args.audio).read_text(encoding='utf-8').splitlines()
+            audio_paths = [line.strip() for line in lines if line.strip()]
+            batch = run_speaker_diarization_batch(audio_paths, args.speakers)
+            segments = [
+                {'audio': audio_path, 'segments': file_segments}
+                for audio_path, file_segments in zip(audio_paths, batch)
+            ] if any(batch) else []
+        else:
+            segments = run_speaker_diarization(args.audio, args.speakers)
         if segments and args.output:
             import json
             Path(args.output).write_text(
@@ -363,14 +690,24 @@ def main():
         extract_tables_from_pdf(args.pdf, args.output)
     
     elif args.command == "coverage":
-        result = calculate_text_coverage(args.pdf)
-        print(f"\nText Coverage Analysis")
-        print(f"{'='*40}")
-        print(f"Average coverage: {result['average_coverage']}%")
-        print(f"Needs OCR: {'Yes' if result['needs_ocr'] else 'No'}")
-        print(f"\nPer-page coverage:")
-        for p in result['pages']:
-            print(f"  Page {p['page']}: {p['coverage']}%")
+        import fitz
+        
+        doc = fitz.open(args.pdf)
+        try:
+            result = calculate_text_coverage(doc=doc)
+            print(f"\nText Coverage Analysis")
+            print(f"{'='*40}")
+            print(f"Average coverage: {result['average_coverage']}%")
+            print(f"Needs OCR: {'Yes' if result['needs_ocr'] else 'No'}")
+            print(f"\nPer-page coverage:")
+            for p in result['pages']:
+                print(f"  Page {p['page']}: {p['coverage']}%")
+            
+            if args.extract_tables:
+                print()
+                extract_tables_from_pdf(output_dir=args.extract_tables, doc=doc)
+        finally:
+            doc.close()
     
     else:
         parser.print_help()
@@ -12,10 +12,17 @@ Usage / 用法:
 """
 
 import sys
-import importlib
+import functools
+import importlib.metadata
+import importlib.util
 import shutil
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+
+# Supported Python versions, inclusive / 支持的 Python 版本（含两端）
+REQUIRED_PYTHON_MIN = (3, 10)
+REQUIRED_PYTHON_MAX = (3, 12)
+PYTHON_RANGE = "{}.{}-{}.{}".format(*REQUIRED_PYTHON_MIN, *REQUIRED_PYTHON_MAX)
 
 # Dependency level definitions / 依赖级别定义
 DEPENDENCY_LEVELS = {
@@ -23,67 +30,124 @@ DEPENDENCY_LEVELS = {
         "description": "Basic - PDF text extraction, audio/video transcription",
         "description_cn": "基础功能 - PDF文本提取、音视频转写",
         "packages": {
-            "pymupdf": {"import": "fitz", "size": "~15MB"},
-            "pydub": {"import": "pydub", "size": "~1MB"},
-            "funasr": {"import": "funasr", "size": "~500MB"},
-            "modelscope": {"import": "modelscope", "size": "~50MB"},
-            "psutil": {"import": "psutil", "size": "~1MB"},
+            "pymupdf": {"import": "fitz", "size_mb": 15},
+            "pydub": {"import": "pydub", "size_mb": 1},
+            "funasr": {"import": "funasr", "size_mb": 500},
+            "modelscope": {"import": "modelscope", "size_mb": 50},
+            "psutil": {"import": "psutil", "size_mb": 1},
         },
         "system": ["ffmpeg"]
     },
+    "vad": {
+        "description": "VAD - Cut audio chunks at pauses (optional, fixed windows otherwise)",
+        "description_cn": "语音活动检测 - 在停顿处切分音频（可选，否则使用固定窗口）",
+        "packages": {
+            # silero-vad pins torch and torchaudio / silero-vad 依赖 torch 和 torchaudio
+            "silero-vad": {"import": "silero_vad", "size_mb": 5},
+            "torch": {"import": "torch", "size_mb": 2048},
+            "torchaudio": {"import": "torchaudio", "size_mb": 10},
+        }
+    },
     "ocr": {
         "description": "OCR - Scanned PDF and image text recognition",
         "description_cn": "OCR功能 - 扫描PDF和图片文字识别",
         "packages": {
-            "rapidocr-onnxruntime": {"import": "rapidocr_onnxruntime", "size": "~50MB"},
-            "opencv-python-headless": {"import": "cv2", "size": "~30MB"},
+            "rapidocr-onnxruntime": {"import": "rapidocr_onnxruntime", "size_mb": 50},
+            "opencv-python-headless": {"import": "cv2", "size_mb": 30},
         }
     },
     "youtube": {
         "description": "YouTube - Get YouTube video subtitles",
         "description_cn": "YouTube转录 - 获取YouTube视频字幕",
         "packages": {
-            "yt-dlp": {"import": "yt_dlp", "size": "~5MB"},
+            "yt-dlp": {"import": "yt_dlp", "size_mb": 5},
         }
     },
     "table": {
         "description": "Table extraction - Extract tables from PDF",
         "description_cn": "表格提取 - 从PDF提取表格数据",
         "packages": {
-            "rapid-table": {"import": "rapid_table", "size": "~100MB"},
-            "beautifulsoup4": {"import": "bs4", "size": "~1MB"},
+            "rapid-table": {"import": "rapid_table", "size_mb": 100},
+            "lxml": {"import": "lxml", "size_mb": 5},
+            "beautifulsoup4": {"import": "bs4", "size_mb": 1},
         }
     },
     "speaker": {
         "description": "Speaker diarization - Identify speakers (requires HuggingFace Token)",
         "description_cn": "说话人分离 - 识别不同说话人 (需要HuggingFace Token)",
         "packages": {
-            "pyannote.audio": {"import": "pyannote.audio", "size": "~200MB"},
-            "torch": {"import": "torch", "size": "~2GB"},
+            "pyannote.audio": {"import": "pyannote.audio", "size_mb": 200},
+            "torch": {"import": "torch", "size_mb": 2048},
         },
         "requires_token": "HUGGINGFACE_TOKEN"
     }
 }
 
+# pip errors that retrying cannot fix, shared by the installers
+# 重试无法解决的 pip 错误，供各安装脚本共用
+UNRECOVERABLE_PIP_ERRORS = (
+    "No matching distribution",
+    "Could not find a version",
+    "Invalid requirement",
+    "ResolutionImpossible",
+)
+
+# Precomputed install size per package; levels share some (torch), so totals
+# are summed over package names, never over level sums
+# 预先计算的各包安装大小；部分包在多个级别中共用（torch），总量按包名去重求和，而非累加各级别
+PACKAGE_SIZE_MB = {
+    pkg: info["size_mb"]
+    for config in DEPENDENCY_LEVELS.values()
+    for pkg, info in config.get("packages", {}).items()
+}
+
+def format_size(size_mb: float) -> str:
+    """Format an approximate size for display / 格式化显示大小"""
+    if size_mb >= 1024:
+        return f"~{size_mb/1024:.1f}GB"
+    return f"~{size_mb:.0f}MB"
+
 def check_python_version() -> Tuple[bool, str]:
     """Check Python version / 检查 Python 版本"""
     version = sys.version_info
-    if 3 <= version.major and 10 <= version.minor <= 12:
+    if REQUIRED_PYTHON_MIN <= version[:2] <= REQUIRED_PYTHON_MAX:
         return True, f"Python {version.major}.{version.minor}.{version.micro}"
-    return False, f"Python {version.major}.{version.minor} (need 3.10-3.12 / 需要 3.10-3.12)"
+    return False, f"Python {version.major}.{version.minor} (need {PYTHON_RANGE} / 需要 {PYTHON_RANGE})"
+
+# Installed package versions found so far / 已检测到的包版本缓存
+_INSTALLED_VERSIONS: Dict[str, str] = {}
 
 def check_package(package_name: str, import_name: str) -> Tuple[bool, str]:
     """Check if a package is installed / 检查包是否已安装"""
+    if package_name in _INSTALLED_VERSIONS:
+        return True, _INSTALLED_VERSIONS[package_name]
+    
+    # Read dist metadata first, avoids executing heavy packages like torch
+    # 优先读取安装元数据，避免导入 torch 等重量级包
     try:
-        module = importlib.import_module(import_name)
-        version = getattr(module, "__version__", "installed / 已安装")
-        return True, version
-    except ImportError:
-        return False, "not installed / 未安装"
+        version = importlib.metadata.version(package_name)
+    except importlib.metadata.PackageNotFoundError:
+        # Locate the module without executing it / 仅定位模块，不执行
+        try:
+            spec = importlib.util.find_spec(import_name)
+        except (ImportError, ValueError):
+            spec = None
+        if spec is None:
+            # Not cached, so a later install is picked up / 不缓存，以便安装后重新检测
+            return False, "not installed / 未安装"
+        version = "installed / 已安装"
+    
+    _INSTALLED_VERSIONS[package_name] = version
+    return True, version
+
+@functools.lru_cache(maxsize=None)
+def _which(name: str) -> Optional[str]:
+    """Resolve an executable on PATH once per process / 每个进程只查找一次可执行文件"""
+    return shutil.which(name)
 
 def check_system_dependency(name: str) -> Tuple[bool, str]:
     """Check system dependency / 检查系统依赖"""
-    path = shutil.which(name)
+    path = _which(name)
     if path:
         return True, path
     return False, "not found / 未找到"
@@ -110,7 +174,7 @@ def check_level(level: str) -> Dict:
         results["packages"][pkg_name] = {
             "installed": ok,
             "version": version,
-            "size": pkg_info["size"]
+            "size_mb": pkg_info["size_mb"]
         }
         if not ok:
             results["all_ok"] = False
@@ -162,7 +226,7 @@ def print_status_report(results: Dict):
         
         for pkg, info in data.get("packages", {}).items():
             pkg_status = "[OK]" if info["installed"] else "[X]"
-            print(f"    {pkg_status} {pkg}: {info['version']} ({info['size']})")
+            print(f"    {pkg_status} {pkg}: {info['version']} ({format_size(info['size_mb'])})")
         
         for sys_dep, info in data.get("system", {}).items():
             sys_status = "[OK]" if info["found"] else "[X]"
@@ -187,25 +251,17 @@ def print_status_report(results: Dict):
 
 def get_install_estimate(levels: List[str]) -> str:
     """Get installation estimate info / 获取安装估算信息"""
-    total_size = 0
-    packages = []
-    
-    for level in levels:
-        if level in DEPENDENCY_LEVELS:
-            for pkg, info in DEPENDENCY_LEVELS[level].get("packages", {}).items():
-                size_str = info["size"]
-                if "GB" in size_str:
-                    total_size += float(size_str.replace("~", "").replace("GB", "")) * 1024
-                elif "MB" in size_str:
-                    total_size += float(size_str.replace("~", "").replace("MB", ""))
-                packages.append(pkg)
-    
-    if total_size > 1024:
-        size_display = f"{total_size/1024:.1f}GB"
-    else:
-        size_display = f"{total_size:.0f}MB"
+    packages = {
+        pkg
+        for level in levels if level in DEPENDENCY_LEVELS
+        for pkg in DEPENDENCY_LEVELS[level].get("packages", {})
+    }
+    total_size = sum(PACKAGE_SIZE_MB[pkg] for pkg in packages)
+    package_count = len(packages)
+    
+    size_display = format_size(total_size).lstrip("~")
     
-    return f"Need to install {len(packages)} packages, ~{size_display} / 需安装 {len(packages)} 个包，约 {size_display}"
+    return f"Need to install {package_count} packages, ~{size_display} / 需安装 {package_count} 个包，约 {size_display}"
 
 if __name__ == "__main__":
     import argparse
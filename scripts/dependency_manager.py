@@ -17,6 +17,7 @@ Usage / 用法:
 """
 
 import sys
+import importlib
 import subprocess
 import time
 from pathlib import Path
@@ -25,29 +26,36 @@ from typing import List, Optional
 # Import dependency check module
 script_dir = Path(__file__).parent
 sys.path.insert(0, str(script_dir))
-from check_dependencies import DEPENDENCY_LEVELS, check_level, check_package
+from check_dependencies import DEPENDENCY_LEVELS, UNRECOVERABLE_PIP_ERRORS, check_level, check_package
 
 MAX_RETRIES = 3
 RETRY_DELAY = 5  # seconds
 
-def install_package(package_name: str, retries: int = MAX_RETRIES) -> bool:
-    """Install a single package with retry support / 安装单个包，支持重试"""
+def install_packages(packages: List[str], retries: int = MAX_RETRIES) -> bool:
+    """Install packages in a single pip call with retry support / 单次 pip 调用批量安装，支持重试"""
+    names = ", ".join(packages)
+    
     for attempt in range(retries):
-        print(f"\n[{attempt+1}/{retries}] Installing / 正在安装 {package_name}...")
+        print(f"\n[{attempt+1}/{retries}] Installing / 正在安装 {names}...")
         
         try:
             result = subprocess.run(
-                [sys.executable, "-m", "pip", "install", package_name, "-q"],
+                [sys.executable, "-m", "pip", "install", *packages, "-q"],
                 capture_output=True,
                 text=True,
-                timeout=600  # 10 minute timeout
+                timeout=600 * len(packages)  # 10 minute timeout per package
             )
             
             if result.returncode == 0:
-                print(f"[OK] {package_name} installed successfully / 安装成功")
+                print(f"[OK] {names} installed successfully / 安装成功")
                 return True
             else:
                 print(f"[X] Installation failed / 安装失败: {result.stderr[:200]}")
+                # Bad names or impossible constraints fail the same way every time
+                # 包名错误或约束无解时每次都会失败，无需重试
+                if any(marker in result.stderr for marker in UNRECOVERABLE_PIP_ERRORS):
+                    print("[X] Permanent failure, not retrying / 永久性错误，不再重试")
+                    return False
                 
         except subprocess.TimeoutExpired:
             print(f"[X] Installation timeout / 安装超时")
@@ -60,6 +68,10 @@ def install_package(package_name: str, retries: int = MAX_RETRIES) -> bool:
     
     return False
 
+def install_package(package_name: str, retries: int = MAX_RETRIES) -> bool:
+    """Install a single package with retry support / 安装单个包，支持重试"""
+    return install_packages([package_name], retries)
+
 def install_level(level: str) -> bool:
     """Install all dependencies for a specific level / 安装指定级别的所有依赖"""
     if level not in DEPENDENCY_LEVELS:
@@ -76,22 +88,31 @@ def install_level(level: str) -> bool:
     print(f"Packages / 包数量: {len(packages)}")
     print(f"{'='*50}")
     
-    success_count = 0
-    failed = []
+    def is_installed(pkg: str) -> bool:
+        ok, _ = check_package(pkg, config["packages"][pkg]["import"])
+        return ok
     
+    missing = []
     for pkg in packages:
-        pkg_info = config["packages"][pkg]
-        # Check if already installed
-        ok, _ = check_package(pkg, pkg_info["import"])
-        if ok:
+        if is_installed(pkg):
             print(f"[OK] {pkg} already installed / 已安装")
-            success_count += 1
-            continue
-        
-        if install_package(pkg):
-            success_count += 1
         else:
-            failed.append(pkg)
+            missing.append(pkg)
+    
+    if missing:
+        # One pip run resolves and downloads everything together / 一次 pip 调用统一解析和下载
+        if not install_packages(missing) and len(missing) > 1:
+            # pip is all-or-nothing; retry one by one so a bad package doesn't block the rest
+            # pip 批量安装要么全成功要么全失败；逐个重试，避免单个包阻塞其他包
+            print("\nBatch install failed, installing individually / 批量安装失败，改为逐个安装")
+            for pkg in missing:
+                install_package(pkg)
+        
+        # Pick up newly installed modules / 识别新安装的模块
+        importlib.invalidate_caches()
+    
+    failed = [pkg for pkg in missing if not is_installed(pkg)]
+    success_count = len(packages) - len(failed)
     
     print(f"\n{'='*50}")
     print(f"Installation complete / 安装完成: {success_count}/{len(packages)} successful / 成功")
@@ -196,7 +217,7 @@ def main():
     )
     install_parser.add_argument(
         "--level", 
-        choices=["basic", "ocr", "youtube", "table", "speaker", "full"],
+        choices=["basic", "vad", "ocr", "youtube", "table", "speaker", "full"],
         required=True, 
         help="Installation level / 安装级别"
     )
@@ -20,8 +20,28 @@ import json
 import re
 from pathlib import Path
 from typing import List, Dict, Optional
-from dataclasses import dataclass, asdict
-from datetime import timedelta
+from dataclasses import dataclass
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Timestamp line pattern, matched per line over the whole buffer / 时间戳行模式，在整个文本上逐行匹配
+# - **Speaker** [00:00:00]: text
+# - [00:00:00 - 00:00:05] text
+# - [00:00:00] text
+# Whitespace inside a line is [^\S\n] so matches never span lines; text ends on \S,
+# which drops trailing whitespace like str.strip() did.
+# 行内空白使用 [^\S\n]，保证匹配不跨行；文本以 \S 结尾，等同于去除行尾空白。
+_TS = r'\d{1,2}:\d{2}:\d{2}'
+_WS = r'[^\S\n]*'
+_PAT_LINE = re.compile(
+    rf'^{_WS}(?:\*\*(?P<speaker>.+?)\*\*{_WS}\[(?P<speaker_start>{_TS})\]:{_WS}(?P<speaker_text>.*\S)'
+    rf'|\[(?P<start>{_TS})(?:{_WS}-{_WS}(?P<end>{_TS}))?\]{_WS}(?P<text>.*\S))',
+    re.MULTILINE
+)
 
 @dataclass
 class TranscriptSegment:
@@ -43,129 +63,103 @@ def parse_markdown_transcript(content: str) -> List[TranscriptSegment]:
     segments = []
     index = 0
     
-    # Timestamp patterns / 时间戳模式
-    patterns = [
-        # [00:00:00 - 00:00:05] text
-        r'\[(\d{1,2}:\d{2}:\d{2})\s*-\s*(\d{1,2}:\d{2}:\d{2})\]\s*(.+)',
-        # [00:00:00] text
-        r'\[(\d{1,2}:\d{2}:\d{2})\]\s*(.+)',
-        # **Speaker** [00:00:00]: text
-        r'\*\*(.+?)\*\*\s*\[(\d{1,2}:\d{2}:\d{2})\]:\s*(.+)',
-    ]
-    
-    for line in content.split('\n'):
-        line = line.strip()
-        if not line:
-            continue
+    for match in _PAT_LINE.finditer(content):
+        if match.group('speaker') is not None:
+            # **Speaker** [time]: text
+            speaker = match.group('speaker')
+            start = parse_timestamp(match.group('speaker_start'))
+            end = start + 5.0
+            text = match.group('speaker_text')
+        else:
+            speaker = None
+            start = parse_timestamp(match.group('start'))
+            if match.group('end') is not None:
+                # [start - end] text
+                end = parse_timestamp(match.group('end'))
+            else:
+                # [time] text
+                end = start + 5.0  # default 5 seconds
+            text = match.group('text')
         
-        for pattern in patterns:
-            match = re.match(pattern, line)
-            if match:
-                groups = match.groups()
-                
-                if len(groups) == 3 and ':' in groups[0] and ':' in groups[1]:
-                    # [start - end] text
-                    start = parse_timestamp(groups[0])
-                    end = parse_timestamp(groups[1])
-                    text = groups[2]
-                    speaker = None
-                elif len(groups) == 2:
-                    # [time] text
-                    start = parse_timestamp(groups[0])
-                    end = start + 5.0  # default 5 seconds
-                    text = groups[1]
-                    speaker = None
-                elif len(groups) == 3:
-                    # **Speaker** [time]: text
-                    speaker = groups[0]
-                    start = parse_timestamp(groups[1])
-                    end = start + 5.0
-                    text = groups[2]
-                else:
-                    continue
-                
-                index += 1
-                segments.append(TranscriptSegment(
-                    index=index,
-                    start_time=start,
-                    end_time=end,
-                    text=text,
-                    speaker=speaker
-                ))
-                break
+        index += 1
+        segments.append(TranscriptSegment(
+            index=index,
+            start_time=start,
+            end_time=end,
+            text=text,
+            speaker=speaker
+        ))
     
     return segments
 
 def parse_timestamp(ts: str) -> float:
     """Parse timestamp to seconds (HH:MM:SS or MM:SS) / 解析时间戳为秒数"""
     parts = ts.split(':')
-    if len(parts) == 3:
-        h, m, s = map(float, parts)
-        return h * 3600 + m * 60 + s
-    elif len(parts) == 2:
-        m, s = map(float, parts)
-        return m * 60 + s
+    try:
+        # Transcript timestamps are whole seconds; sum as ints, convert once
+        # 转录时间戳为整秒，按整数求和后只转换一次
+        if len(parts) == 3:
+            return float(int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2]))
+        elif len(parts) == 2:
+            return float(int(parts[0]) * 60 + int(parts[1]))
+    except ValueError:
+        # Fractional seconds, e.g. 00:01:02.5 / 带小数的秒数
+        return sum(float(p) * 60 ** i for i, p in enumerate(reversed(parts)))
     return 0.0
 
+def _format_timestamp(seconds: float, sep: str) -> str:
+    """Format seconds as HH:MM:SS<sep>mmm using integer milliseconds / 以整数毫秒格式化时间戳"""
+    ms = int(seconds * 1000 + 0.5)
+    hours, ms = divmod(ms, 3_600_000)
+    minutes, ms = divmod(ms, 60_000)
+    secs, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{sep}{ms:03d}"
+
 def format_srt_timestamp(seconds: float) -> str:
     """Format to SRT timestamp (HH:MM:SS,mmm) / 格式化为SRT时间戳"""
-    td = timedelta(seconds=seconds)
-    hours, remainder = divmod(int(td.total_seconds()), 3600)
-    minutes, secs = divmod(remainder, 60)
-    millis = int((seconds % 1) * 1000)
-    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+    return _format_timestamp(seconds, ",")
 
 def format_vtt_timestamp(seconds: float) -> str:
     """Format to VTT timestamp (HH:MM:SS.mmm) / 格式化为VTT时间戳"""
-    td = timedelta(seconds=seconds)
-    hours, remainder = divmod(int(td.total_seconds()), 3600)
-    minutes, secs = divmod(remainder, 60)
-    millis = int((seconds % 1) * 1000)
-    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
+    return _format_timestamp(seconds, ".")
 
 def to_srt(segments: List[TranscriptSegment]) -> str:
     """Convert to SRT format / 转换为SRT格式"""
-    lines = []
-    for seg in segments:
-        lines.append(str(seg.index))
-        lines.append(f"{format_srt_timestamp(seg.start_time)} --> {format_srt_timestamp(seg.end_time)}")
-        text = seg.text
-        if seg.speaker:
-            text = f"[{seg.speaker}] {text}"
-        lines.append(text)
-        lines.append("")
-    return "\n".join(lines)
+    def blocks():
+        for seg in segments:
+            text = f"[{seg.speaker}] {seg.text}" if seg.speaker else seg.text
+            yield (f"{seg.index}\n"
+                   f"{format_srt_timestamp(seg.start_time)} --> {format_srt_timestamp(seg.end_time)}\n"
+                   f"{text}\n")
+    return "\n".join(blocks())
 
 def to_vtt(segments: List[TranscriptSegment]) -> str:
     """Convert to VTT format / 转换为VTT格式"""
-    lines = ["WEBVTT", ""]
-    for seg in segments:
-        lines.append(f"{format_vtt_timestamp(seg.start_time)} --> {format_vtt_timestamp(seg.end_time)}")
-        text = seg.text
-        if seg.speaker:
-            text = f"<v {seg.speaker}>{text}"
-        lines.append(text)
-        lines.append("")
-    return "\n".join(lines)
+    def blocks():
+        yield "WEBVTT\n"
+        for seg in segments:
+            text = f"<v {seg.speaker}>{seg.text}" if seg.speaker else seg.text
+            yield (f"{format_vtt_timestamp(seg.start_time)} --> {format_vtt_timestamp(seg.end_time)}\n"
+                   f"{text}\n")
+    return "\n".join(blocks())
 
 def to_json(segments: List[TranscriptSegment]) -> str:
     """Convert to JSON format / 转换为JSON格式"""
     data = {
         "format": "PDF-Audio-Video-to-Markdown-with-AI transcript",
         "version": "1.0",
-        "segments": [asdict(seg) for seg in segments]
+        "segments": [vars(seg) for seg in segments]  # flat dataclass, no deep copy needed
     }
+    if HAS_ORJSON:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode("utf-8")
     return json.dumps(data, indent=2, ensure_ascii=False)
 
 def to_txt(segments: List[TranscriptSegment]) -> str:
     """Convert to plain text format / 转换为纯文本格式"""
-    lines = []
-    for seg in segments:
-        if seg.speaker:
-            lines.append(f"{seg.speaker}: {seg.text}")
-        else:
-            lines.append(seg.text)
-    return "\n".join(lines)
+    return "\n".join(
+        f"{seg.speaker}: {seg.text}" if seg.speaker else seg.text
+        for seg in segments
+    )
 
 def convert_file(input_path: str, output_format: str, output_path: Optional[str] = None) -> str:
     """Convert file format / 转换文件格式"""
@@ -16,26 +16,71 @@ Example / 示例:
     python process_all.py ./input ./output
 """
 
+import os
 import sys
 import json
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 
 # Import single file processor / 导入单文件处理器
 from process_file import (
-    detect_file_type, 
+    detect_file_type,
     process_with_retry,
-    FILE_TYPE_MAP
+    ProcessResult,
+    SUPPORTED_EXTENSIONS,
+    share_ocr_cpus
 )
 
+# Worker pools / 工作进程池
+MEDIA_WORKERS = 2  # Audio/video each load a large ASR model / 音视频各自加载大型ASR模型
+DOC_WORKERS = min(os.cpu_count() or 1, 4)  # PDF/image OCR / PDF和图片OCR
+
 
 def find_processable_files(input_dir: Path) -> list:
-    """Find all processable files / 查找所有可处理的文件"""
+    """
+    Find all processable files in one directory pass / 单次遍历目录查找所有可处理的文件
+    
+    Returns sorted (path, size_bytes, mtime) tuples; stats come from the scandir
+    entry, so files are not stat'ed again.
+    返回按路径排序的 (路径, 字节数, 修改时间) 列表；来自 scandir 条目，无需再次 stat。
+    """
     files = []
-    for ext in FILE_TYPE_MAP.keys():
-        files.extend(input_dir.glob(f"*{ext}"))
-        files.extend(input_dir.glob(f"*{ext.upper()}"))
-    return sorted(set(files))
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            if os.path.splitext(entry.name)[1].lower() not in SUPPORTED_EXTENSIONS:
+                continue
+            if entry.is_file():
+                st = entry.stat()
+                files.append((Path(entry.path), st.st_size, st.st_mtime))
+    return sorted(files)
+
+
+def get_processed_files(output_dir: Path) -> dict:
+    """
+    Load successful results of the previous batch run / 加载上次批处理的成功结果
+    
+    Keyed by file name; (size_bytes, mtime) in each entry is a cheap content
+    signature, so unchanged files are detected without reading them.
+    以文件名为键；条目中的 (字节数, 修改时间) 作为廉价的内容签名，无需读取文件即可判断是否变化。
+    """
+    report_file = output_dir / "batch_report.json"
+    if not report_file.exists():
+        return {}
+    try:
+        report = json.loads(report_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return {
+        r["file"]: r for r in report.get("results", [])
+        if r and r.get("success") and "mtime" in r
+    }
 
 
 def main(input_dir: str = "./input", output_dir: str = "./output"):
@@ -63,27 +108,53 @@ def main(input_dir: str = "./input", output_dir: str = "./output"):
     print(f"  Files: {len(files)}")
     print(f"{'='*60}")
     
-    results = []
+    results = [None] * len(files)
     success_count = 0
+    processed = get_processed_files(output_path)
     
-    for i, file in enumerate(files):
-        print(f"\n[{i+1}/{len(files)}] {file.name}")
-        
-        result = process_with_retry(file, output_path)
-        results.append({
-            "file": file.name,
-            "type": detect_file_type(file),
-            "success": result.success,
-            "strategy": result.strategy,
-            "text_length": result.text_length,
-            "error": result.error
-        })
+    # Files are independent; run them in parallel, keeping report order by index.
+    # Each doc worker OCRs on threads within its share of the cores.
+    # 文件之间相互独立，并行处理，报告按原顺序排列；每个文档工作进程在其分得的核心内用线程OCR。
+    with ProcessPoolExecutor(max_workers=DOC_WORKERS, initializer=share_ocr_cpus,
+                             initargs=((os.cpu_count() or 1) // DOC_WORKERS,)) as doc_pool, \
+         ProcessPoolExecutor(max_workers=MEDIA_WORKERS) as media_pool:
+        futures = {}
+        for i, (file, size, mtime) in enumerate(files):
+            previous = processed.get(file.name)
+            if (previous and previous["size_bytes"] == size and previous["mtime"] == mtime
+                    and (output_path / f"{file.stem}.md").exists()):
+                print(f"\n[SKIP] {file.name} (unchanged since last run)")
+                results[i] = previous
+                success_count += 1
+                continue
+            pool = media_pool if detect_file_type(file) in ("audio", "video") else doc_pool
+            futures[pool.submit(process_with_retry, file, output_path)] = i
         
-        if result.success:
-            success_count += 1
-            print(f"  [OK] {result.strategy}, {result.text_length} chars")
-        else:
-            print(f"  [X] {result.error}")
+        for done, future in enumerate(as_completed(futures), 1 + len(files) - len(futures)):
+            i = futures[future]
+            file, size, mtime = files[i]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = ProcessResult(file_path=str(file), file_type=detect_file_type(file), error=str(e))
+            
+            print(f"\n[{done}/{len(files)}] {file.name} ({size / 1024:.1f} KB)")
+            results[i] = {
+                "file": file.name,
+                "type": result.file_type,
+                "size_bytes": size,
+                "mtime": mtime,
+                "success": result.success,
+                "strategy": result.strategy,
+                "text_length": result.text_length,
+                "error": result.error
+            }
+            
+            if result.success:
+                success_count += 1
+                print(f"  [OK] {result.strategy}, {result.text_length} chars")
+            else:
+                print(f"  [X] {result.error}")
     
     # Generate report / 生成报告
     report = {
@@ -97,7 +168,10 @@ def main(input_dir: str = "./input", output_dir: str = "./output"):
     }
     
     report_file = output_path / "batch_report.json"
-    report_file.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    if HAS_ORJSON:
+        report_file.write_bytes(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+    else:
+        report_file.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
     
     print(f"\n{'='*60}")
     print(f"Batch Processing Complete")
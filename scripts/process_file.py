@@ -18,21 +18,43 @@ Example / 示例:
     python process_file.py ./input/report.pdf ./output
 """
 
+import os
 import sys
 import json
 import time
-import hashlib
+import shutil
+import threading
+import multiprocessing
 import traceback
 from pathlib import Path
+from functools import lru_cache
+from contextlib import closing
 from datetime import datetime
 from dataclasses import dataclass, asdict
 from typing import Optional
+from concurrent.futures import (
+    ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+)
 
 # Config / 配置
+DEBUG = bool(os.environ.get("DOCPIPE_DEBUG"))  # Capture full tracebacks / 记录完整回溯
 MAX_RETRIES = 3
 AUDIO_SIZE_THRESHOLD_MB = 10  # Use chunked processing above this size / 大于此大小使用分段处理
 AUDIO_CHUNK_DURATION_SEC = 30  # Chunk duration / 分段时长（秒）
+ASR_SAMPLE_RATE = 16000  # paraformer-zh input rate (mono) / paraformer-zh 输入采样率（单声道）
+AUDIO_STREAM_BLOCK_SEC = 600  # Decode-ahead block for streamed audio / 流式解码的预读块时长（秒）
+VAD_MAX_GAP_SEC = 2  # Longer pauses split chunks and are skipped / 更长的停顿会切分分段并被跳过
 PDF_TEXT_MIN_CHARS = 50  # Min chars per page, below needs OCR / 每页最少字符数，低于此需要OCR
+OCR_DPI = 150  # First-pass OCR render resolution / 首次OCR渲染分辨率
+OCR_RETRY_DPI = 300  # Re-render sparse OCR pages at this resolution / 结果过少的页面以此分辨率重新渲染
+OCR_GRAY_TOLERANCE = 8  # Max channel spread for a page to count as grayscale / 页面视为灰度的最大通道差
+OCR_GRAY_PROBE_DPI = 7.2  # 10% thumbnail for the grayscale probe / 灰度检测用的10%缩略图
+OCR_PROCESS_MIN_PAGES = 8  # Use processes (not threads) from this many OCR pages / OCR页数达到此值时改用多进程
+OCR_WARMUP_SIZE = 640  # Dummy image edge for OCR warm-up / OCR预热图像边长
+ASR_BATCH_SIZE = 8  # Chunks decoded per FunASR call / 每次FunASR调用解码的分段数
+OCR_WORKERS = min(os.cpu_count() or 1, 4)  # Threads/processes for PDF page OCR / PDF页面OCR线程或进程数
+OCR_CPU_CORES = os.cpu_count() or 1  # Cores for this process's OCR session / 本进程OCR会话使用的核心数
+OCR_USE_PROCESSES = True  # Allow the process pool for large OCR jobs / 允许大型OCR任务使用进程池
 
 
 @dataclass
@@ -45,11 +67,26 @@ class ProcessResult:
     output_path: str = ""
     text_length: int = 0
     error: Optional[str] = None
+    traceback: Optional[str] = None  # Only filled when DEBUG is set / 仅在 DEBUG 时填充
     attempts: int = 0
     duration_sec: float = 0
     timestamp: str = ""
 
 
+def record_error(result: ProcessResult, error: Exception):
+    """
+    Record a processing error on the result / 在结果中记录处理错误
+    
+    Formatting a traceback walks every frame and reads source lines, so it is
+    only done (once, here) when DEBUG is set.
+    格式化回溯需要遍历所有栈帧并读取源码行，因此仅在设置 DEBUG 时于此处生成一次。
+    """
+    result.error = str(error)
+    if DEBUG:
+        result.traceback = traceback.format_exc()
+        print(result.traceback, file=sys.stderr)
+
+
 # File type mapping / 文件类型映射
 FILE_TYPE_MAP = {
     ".pdf": "pdf",
@@ -57,6 +94,7 @@ FILE_TYPE_MAP = {
     ".mp3": "audio", ".wav": "audio", ".m4a": "audio", ".flac": "audio", ".ogg": "audio",
     ".mp4": "video", ".avi": "video", ".mkv": "video", ".mov": "video", ".webm": "video",
 }
+SUPPORTED_EXTENSIONS = frozenset(FILE_TYPE_MAP)
 
 
 def detect_file_type(path: Path) -> str:
@@ -65,53 +103,238 @@ def detect_file_type(path: Path) -> str:
     return FILE_TYPE_MAP.get(ext, "unknown")
 
 
-def get_file_hash(path: Path) -> str:
-    """Calculate file SHA256 / 计算文件SHA256"""
-    sha256 = hashlib.sha256()
-    with open(path, 'rb') as f:
-        for chunk in iter(lambda: f.read(8192), b''):
-            sha256.update(chunk)
-    return sha256.hexdigest()[:16]
+# ============== PDF Processing / PDF处理 ==============
 
+_OCR_ENGINE = None
+_OCR_LOCK = threading.Lock()
 
-# ============== PDF Processing / PDF处理 ==============
 
 def init_ocr_engine():
-    """Initialize OCR engine / 初始化OCR引擎"""
-    try:
-        from rapidocr_onnxruntime import RapidOCR
-        return RapidOCR()
-    except ImportError:
-        print("  [WARN] RapidOCR not installed, OCR unavailable")
-        return None
+    """Initialize OCR engine once per process / 初始化OCR引擎（每个进程一次）"""
+    with _OCR_LOCK:  # a background prefetch may be initializing it / 后台预取可能正在初始化
+        return _init_ocr_engine_locked()
+
+
+def _init_ocr_engine_locked():
+    """Create and warm up the OCR engine; caller holds _OCR_LOCK / 创建并预热OCR引擎（调用方持有锁）"""
+    global _OCR_ENGINE
+    if _OCR_ENGINE is None:
+        try:
+            from rapidocr_onnxruntime import RapidOCR
+        except ImportError:
+            print("  [WARN] RapidOCR not installed, OCR unavailable")
+            return None
+        import numpy as np
+        
+        # One session per process: OCR threads share it, so it gets all of this
+        # process's cores; process-pool workers are given their share beforehand
+        # 每个进程一个会话：OCR 线程共用它，因此占用本进程的全部核心；进程池工作进程预先分得各自的份额
+        intra = OCR_CPU_CORES
+        threads = {}
+        for prefix in ("", "det_", "cls_", "rec_"):  # global and per-model keys / 全局及各模型键
+            threads[f"{prefix}intra_op_num_threads"] = intra
+            threads[f"{prefix}inter_op_num_threads"] = 1
+        try:
+            engine = RapidOCR(**threads)
+        except TypeError:
+            # Older rapidocr_onnxruntime without keyword config / 旧版本不支持关键字配置
+            engine = RapidOCR()
+        # Warm up once so the first real page (and concurrent first calls) skip ORT's lazy setup
+        # 预热一次，使首个真实页面（及并发的首次调用）不再承担 ORT 的延迟初始化
+        engine(np.full((OCR_WARMUP_SIZE, OCR_WARMUP_SIZE, 3), 255, dtype=np.uint8))
+        _OCR_ENGINE = engine
+    return _OCR_ENGINE
+
+
+@lru_cache(maxsize=None)
+def page_matrix(dpi: float):
+    """Shared render matrix for a DPI, built once / 每个DPI共享的渲染矩阵，仅构建一次"""
+    import fitz
+    
+    return fitz.Matrix(dpi / 72, dpi / 72)
+
+
+def is_grayscale_page(page) -> bool:
+    """Probe a 10% thumbnail for colour / 通过10%缩略图检测页面是否有彩色"""
+    import fitz
+    import numpy as np
+    
+    thumb = page.get_pixmap(matrix=page_matrix(OCR_GRAY_PROBE_DPI), colorspace=fitz.csRGB, alpha=False)
+    px = np.frombuffer(thumb.samples, dtype=np.uint8).reshape(-1, 3)
+    return int(np.ptp(px, axis=1).max(initial=0)) <= OCR_GRAY_TOLERANCE
+
+
+def render_page_image(page, dpi: int = OCR_DPI):
+    """Render a PDF page to a BGR array for OCR / 将PDF页面渲染为BGR数组供OCR使用"""
+    import cv2
+    import fitz
+    import numpy as np
+    
+    if is_grayscale_page(page):
+        # Monochrome scans: rasterize one channel (1/3 of the bytes), expand for the engine
+        # 单色扫描页：只栅格化单通道（1/3 字节），再扩展为引擎所需格式
+        mat = page.get_pixmap(matrix=page_matrix(dpi), colorspace=fitz.csGRAY, alpha=False)
+        img = np.frombuffer(mat.samples, dtype=np.uint8).reshape(mat.height, mat.width)
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    
+    # Render straight to 3-channel RGB so no alpha strip or strided copy is needed
+    # 直接渲染为三通道RGB，无需去除alpha或跨步复制
+    mat = page.get_pixmap(matrix=page_matrix(dpi), colorspace=fitz.csRGB, alpha=False)
+    
+    # One owned, writable copy of the samples, then swap RGB->BGR in place;
+    # samples_mv alone would dangle once the pixmap is freed.
+    # 复制一次得到可写缓冲区后原地交换 RGB->BGR；仅用 samples_mv 会在 pixmap 释放后失效。
+    img = np.frombuffer(bytearray(mat.samples_mv), dtype=np.uint8).reshape(mat.height, mat.width, 3)
+    return cv2.cvtColor(img, cv2.COLOR_RGB2BGR, dst=img)
+
+
+def ocr_image(img, ocr_engine) -> str:
+    """OCR a rendered page image / OCR处理已渲染的页面图像"""
+    result = ocr_engine(img)
+    if result and result[0]:
+        return "\n".join([item[1] for item in result[0]])
+    return ""
 
 
-def ocr_page(page, ocr_engine, dpi: int = 200) -> str:
+def ocr_page(page, ocr_engine, dpi: int = OCR_DPI) -> str:
     """OCR a PDF page / OCR处理PDF页面"""
     if ocr_engine is None:
         return ""
     
     try:
-        import fitz
-        import numpy as np
-        
-        mat = page.get_pixmap(matrix=fitz.Matrix(dpi/72, dpi/72))
-        img = np.frombuffer(mat.samples, dtype=np.uint8).reshape(mat.height, mat.width, mat.n)
-        
-        if mat.n == 4:  # RGBA
-            img = img[:, :, :3]
-        if mat.n >= 3:
-            img = img[:, :, ::-1].copy()
-        
-        result = ocr_engine(img)
-        if result and result[0]:
-            return "\n".join([item[1] for item in result[0]])
+        return ocr_image(render_page_image(page, dpi), ocr_engine)
     except Exception as e:
         print(f"    OCR failed: {e}")
     
     return ""
 
 
+def _collect_ocr(done, pending: dict, results: dict, total_pages: int):
+    """Move finished OCR futures into results / 收集已完成的OCR任务结果"""
+    for future in done:
+        page_num = pending.pop(future)
+        try:
+            text = future.result()
+        except Exception as e:
+            print(f"    Page {page_num + 1}/{total_pages}: OCR failed: {e}")
+            text = ""
+        results[page_num] = text
+        print(f"    Page {page_num + 1}/{total_pages}: OCR {len(text)} chars" if text
+              else f"    Page {page_num + 1}/{total_pages}: OCR no result")
+
+
+def ocr_pages_parallel(doc, page_nums: list, ocr_engine, dpi: int = OCR_DPI) -> dict:
+    """
+    OCR pages on a thread pool / 使用线程池并行OCR页面
+    
+    ONNX Runtime releases the GIL, so recognition runs concurrently. Rendering
+    stays on the calling thread because PyMuPDF documents are not thread-safe,
+    and at most 2x OCR_WORKERS rendered pages are held in memory at once.
+    ONNX Runtime 会释放 GIL，识别可并发执行；PyMuPDF 文档非线程安全，渲染保留在调用线程，
+    内存中最多保留 2 倍 OCR_WORKERS 张已渲染页面。
+    """
+    total_pages = len(doc)
+    results = {}
+    pending = {}
+    
+    with ThreadPoolExecutor(max_workers=OCR_WORKERS) as pool:
+        for page_num in page_nums:
+            while len(pending) >= 2 * OCR_WORKERS:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                _collect_ocr(done, pending, results, total_pages)
+            
+            try:
+                img = render_page_image(doc[page_num], dpi)
+            except Exception as e:
+                print(f"    Page {page_num + 1}/{total_pages}: OCR failed: {e}")
+                results[page_num] = ""
+                continue
+            pending[pool.submit(ocr_image, img, ocr_engine)] = page_num
+        
+        _collect_ocr(list(pending), pending, results, total_pages)
+    
+    return results
+
+
+def _ocr_pages_worker(pdf_path: str, page_nums: list, dpi: int = OCR_DPI) -> dict:
+    """Process-pool worker: OCR pages from its own document handle / 进程池工作函数：使用独立文档句柄OCR页面"""
+    import fitz
+    
+    ocr_engine = init_ocr_engine()
+    if ocr_engine is None:
+        return {}
+    
+    with fitz.open(pdf_path) as doc:
+        return {page_num: ocr_page(doc[page_num], ocr_engine, dpi) for page_num in page_nums}
+
+
+def ocr_pages_multiprocess(pdf_path: Path, page_nums: list, total_pages: int, dpi: int = OCR_DPI) -> dict:
+    """
+    OCR pages across processes, rendering included / 跨进程OCR页面（包括渲染）
+    
+    Each worker opens the PDF itself and keeps its own OCR engine, so rendering
+    scales with cores too. Pages are dealt round-robin to balance the load,
+    and each worker's session gets an equal share of the cores.
+    Workers are spawned, not forked: a fork would copy _OCR_LOCK while the
+    prefetch thread holds it (deadlocking every worker) and would inherit the
+    parent's ONNX Runtime session, which is not fork-safe.
+    每个工作进程独立打开PDF并持有自己的OCR引擎，渲染也可随核心数扩展；页面轮流分配以均衡负载，
+    每个工作进程的会话平分核心。
+    工作进程以 spawn 而非 fork 启动：fork 会复制预取线程持有中的 _OCR_LOCK（导致所有工作进程死锁），
+    并继承父进程中非 fork 安全的 ONNX Runtime 会话。
+    """
+    workers = min(OCR_WORKERS, len(page_nums))
+    results = {}
+    
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=share_ocr_cpus, initargs=(OCR_CPU_CORES // workers,)) as pool:
+        futures = [
+            pool.submit(_ocr_pages_worker, str(pdf_path), page_nums[i::workers], dpi)
+            for i in range(workers)
+        ]
+        for future in as_completed(futures):
+            try:
+                results.update(future.result())
+            except Exception as e:
+                print(f"    OCR worker failed: {e}")
+    
+    for page_num in page_nums:
+        text = results.get(page_num, "")
+        print(f"    Page {page_num + 1}/{total_pages}: OCR {len(text)} chars" if text
+              else f"    Page {page_num + 1}/{total_pages}: OCR no result")
+    
+    return results
+
+
+def share_ocr_cpus(cores: int):
+    """
+    Limit this process's OCR to a share of the cores, threads only / 将本进程的OCR限制在部分核心内，仅使用线程
+    
+    For callers that already run as one of several worker processes (batch
+    mode, OCR process pool): a nested OCR process pool per worker would
+    multiply the process and ONNX Runtime thread counts far beyond the machine.
+    用于本身已是多个工作进程之一的调用方（批处理、OCR进程池）：每个工作进程再嵌套OCR进程池会使
+    进程数和 ONNX Runtime 线程数成倍超出机器核心数。
+    """
+    global OCR_CPU_CORES, OCR_WORKERS, OCR_USE_PROCESSES
+    OCR_CPU_CORES = max(1, cores)
+    OCR_WORKERS = min(OCR_WORKERS, OCR_CPU_CORES)
+    OCR_USE_PROCESSES = False
+
+
+def ocr_pdf_pages(path: Path, doc, page_nums: list, dpi: int = OCR_DPI) -> dict:
+    """OCR pages on processes for large jobs, threads otherwise / 大任务用多进程，否则用线程OCR页面"""
+    if OCR_USE_PROCESSES and len(page_nums) >= OCR_PROCESS_MIN_PAGES and OCR_WORKERS > 1:
+        print(f"    OCR {len(page_nums)} pages at {dpi} DPI ({OCR_WORKERS} processes)...", flush=True)
+        return ocr_pages_multiprocess(path, page_nums, len(doc), dpi)
+    
+    ocr_engine = init_ocr_engine()
+    if ocr_engine is None:
+        return {}
+    print(f"    OCR {len(page_nums)} pages at {dpi} DPI ({OCR_WORKERS} threads)...", flush=True)
+    return ocr_pages_parallel(doc, page_nums, ocr_engine, dpi)
+
+
 def process_pdf(path: Path, output_dir: Path) -> ProcessResult:
     """Process PDF file / 处理PDF文件"""
     result = ProcessResult(file_path=str(path), file_type="pdf")
@@ -121,36 +344,42 @@ def process_pdf(path: Path, output_dir: Path) -> ProcessResult:
         
         doc = fitz.open(path)
         total_pages = len(doc)
-        all_text = []
+        page_texts = []
+        ocr_needed = []
         ocr_pages = 0
         
-        ocr_engine = None
-        
         for page_num in range(total_pages):
-            page = doc[page_num]
-            text = page.get_text()
+            text = doc[page_num].get_text()
             
             if len(text.strip()) < PDF_TEXT_MIN_CHARS:
-                if ocr_engine is None:
-                    ocr_engine = init_ocr_engine()
-                
-                print(f"    Page {page_num + 1}/{total_pages}: OCR...", end="", flush=True)
-                ocr_text = ocr_page(page, ocr_engine)
-                if ocr_text:
-                    text = ocr_text
-                    ocr_pages += 1
-                    print(f" {len(text)} chars")
-                else:
-                    print(" no result")
+                if not ocr_needed:
+                    # Warm the OCR engine up while the remaining pages are text-extracted
+                    # 在提取其余页面文本的同时后台预热OCR引擎
+                    threading.Thread(target=init_ocr_engine, daemon=True).start()
+                ocr_needed.append(page_num)
             else:
                 print(f"    Page {page_num + 1}/{total_pages}: text extracted {len(text)} chars")
             
-            if text.strip():
-                all_text.append(text)
+            page_texts.append(text)
+        
+        ocr_results = ocr_pdf_pages(path, doc, ocr_needed, OCR_DPI) if ocr_needed else {}
+        
+        # Small print needs more pixels; re-OCR only the pages that came back sparse
+        # 小字号需要更高分辨率；仅对结果过少的页面重新OCR
+        retry = [n for n in ocr_needed if len(ocr_results.get(n, "").strip()) < PDF_TEXT_MIN_CHARS]
+        if retry and ocr_results:
+            for page_num, ocr_text in ocr_pdf_pages(path, doc, retry, OCR_RETRY_DPI).items():
+                if len(ocr_text) > len(ocr_results.get(page_num, "")):
+                    ocr_results[page_num] = ocr_text
+        
+        for page_num, ocr_text in ocr_results.items():
+            if ocr_text:
+                page_texts[page_num] = ocr_text
+                ocr_pages += 1
         
         doc.close()
         
-        full_text = "\n\n".join(all_text)
+        full_text = "\n\n".join(text for text in page_texts if text.strip())
         output_file = output_dir / f"{path.stem}.md"
         output_file.write_text(f"# {path.name}\n\n{full_text}", encoding="utf-8")
         
@@ -162,8 +391,7 @@ def process_pdf(path: Path, output_dir: Path) -> ProcessResult:
         print(f"    Strategy: {result.strategy} (OCR {ocr_pages}/{total_pages} pages)")
         
     except Exception as e:
-        result.error = str(e)
-        traceback.print_exc()
+        record_error(result, e)
     
     return result
 
@@ -180,57 +408,325 @@ def get_audio_duration(path: Path) -> float:
         return path.stat().st_size / (128 * 1024 / 8)
 
 
-def process_audio_direct(path: Path) -> str:
-    """Process audio directly / 直接处理音频"""
-    from funasr import AutoModel
-    
-    print("    Loading ASR model...", flush=True)
-    model = AutoModel(model="paraformer-zh", device="cpu", disable_update=True)
+_ASR_MODELS = {}  # device -> AutoModel
+# FunASR's generate() mutates model/frontend state and each call already uses
+# every torch intra-op thread, so calls on a shared model run one at a time
+# FunASR 的 generate() 会修改模型/前端状态，且每次调用已占用全部 torch 线程，故共享模型上串行调用
+_ASR_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def pick_asr_device() -> str:
+    """Use CUDA for ASR when available / 有CUDA时使用GPU进行ASR"""
+    try:
+        import torch
+    except ImportError:
+        return "cpu"
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def get_asr_model(device: Optional[str] = None):
+    """Get the ASR model, loading it once per process and device / 获取ASR模型（每个进程每个设备只加载一次）"""
+    device = device or pick_asr_device()
+    model = _ASR_MODELS.get(device)
+    if model is None:
+        from funasr import AutoModel
+        
+        print(f"    Loading ASR model ({device})...", flush=True)
+        options = {"ncpu": 1} if device.startswith("cuda") else {}
+        model = _ASR_MODELS[device] = AutoModel(
+            model="paraformer-zh", device=device, disable_update=True, **options
+        )
+    return model
+
+
+def transcribe_direct(audio_input) -> str:
+    """Transcribe a file path or 16kHz float32 array in one pass / 一次性转录文件路径或16kHz float32数组"""
+    model = get_asr_model()
     
     print("    Transcribing...", flush=True)
-    result = model.generate(input=str(path))
-    
+    return _generate_text(model, audio_input)
+
+
+def _generate_text(model, chunk) -> str:
+    """Run ASR on one chunk and return its text / 对单个分段执行ASR并返回文本"""
+    with _ASR_LOCK:
+        result = model.generate(input=chunk)
     if result and len(result) > 0:
         return result[0].get("text", "")
     return ""
 
 
-def process_audio_chunked(path: Path, chunk_sec: int = AUDIO_CHUNK_DURATION_SEC) -> str:
-    """Process large audio file in chunks / 分段处理大音频文件"""
-    from pydub import AudioSegment
-    from funasr import AutoModel
+def _generate_texts(model, chunks: list) -> list:
+    """Run ASR on a batch of chunks in one call / 一次调用对一批分段执行ASR"""
+    with _ASR_LOCK:
+        results = model.generate(input=chunks, batch_size=len(chunks)) or []
+    texts = [r.get("text", "") for r in results]
+    return texts + [""] * (len(chunks) - len(texts))
+
+
+_VAD_MODEL = None
+
+
+def get_vad_model():
+    """Get the Silero VAD model if installed, once per process / 获取Silero VAD模型（如已安装，每进程一次）"""
+    global _VAD_MODEL
+    if _VAD_MODEL is None:
+        try:
+            from silero_vad import load_silero_vad
+        except ImportError:
+            return None
+        _VAD_MODEL = load_silero_vad()
+    return _VAD_MODEL
+
+
+def plan_asr_chunks(samples, chunk_sec: int = AUDIO_CHUNK_DURATION_SEC) -> list:
+    """
+    Plan (start, end) sample spans for chunked ASR / 规划分段ASR的 (起始, 结束) 采样区间
+    
+    With Silero VAD installed, chunks are cut at pauses: neighbouring speech
+    segments separated by at most VAD_MAX_GAP_SEC are merged up to chunk_sec,
+    and longer silences are never sent to the ASR model. Without it, fixed
+    chunk_sec windows are used.
+    安装 Silero VAD 时在停顿处切分：间隔不超过 VAD_MAX_GAP_SEC 的相邻语音片段合并至不超过
+    chunk_sec，更长的静音不再送入 ASR 模型；否则使用固定 chunk_sec 窗口。
+    """
+    chunk_len = chunk_sec * ASR_SAMPLE_RATE
+    vad_model = get_vad_model()
+    if vad_model is None:
+        return [(start, min(start + chunk_len, len(samples))) for start in range(0, len(samples), chunk_len)]
+    
+    import torch
+    from silero_vad import get_speech_timestamps
+    
+    speech = get_speech_timestamps(
+        torch.from_numpy(samples), vad_model,
+        sampling_rate=ASR_SAMPLE_RATE, max_speech_duration_s=chunk_sec
+    )
+    
+    max_gap = VAD_MAX_GAP_SEC * ASR_SAMPLE_RATE
+    spans = []
+    for seg in speech:
+        if spans and seg["end"] - spans[-1][0] <= chunk_len and seg["start"] - spans[-1][1] <= max_gap:
+            spans[-1] = (spans[-1][0], seg["end"])
+        else:
+            spans.append((seg["start"], seg["end"]))
+    return spans
+
+
+def iter_transcript(samples, chunk_sec: int = AUDIO_CHUNK_DURATION_SEC):
+    """Yield chunk transcripts of 16kHz mono float32 samples in order / 按顺序产出16kHz单声道float32采样的分段转录文本"""
+    chunks = [samples[start:end] for start, end in plan_asr_chunks(samples, chunk_sec)]
+    
+    print(f"    Duration: {len(samples)/ASR_SAMPLE_RATE:.1f}s, {len(chunks)} chunks")
+    
+    yield from _iter_chunk_texts(chunks, total=len(chunks))
+
+
+def iter_stream_transcript(blocks, chunk_sec: int = AUDIO_CHUNK_DURATION_SEC):
+    """
+    Yield chunk transcripts of streamed sample blocks in order / 按顺序产出流式采样块的分段转录文本
+    
+    Chunks are planned across the whole stream: the last chunk of a block may
+    continue into the next block, so it is carried over and planned again
+    together with it instead of being cut at the block boundary.
+    分段在整个流上规划：每块的最后一个分段可能延续到下一块，因此将其保留并与下一块
+    一起重新规划，而不是在块边界处截断。
+    """
+    import numpy as np
+    
+    carry = np.empty(0, dtype=np.float32)
+    done = total_samples = 0
+    
+    for block in blocks:
+        total_samples += len(block)
+        samples = np.concatenate((carry, block)) if len(carry) else block
+        spans = plan_asr_chunks(samples, chunk_sec)
+        chunks = [samples[start:end] for start, end in spans[:-1]]
+        carry = samples[spans[-1][0]:] if spans else carry[:0]
+        yield from _iter_chunk_texts(chunks, done)
+        done += len(chunks)
+    
+    chunks = [carry[start:end] for start, end in plan_asr_chunks(carry, chunk_sec)] if len(carry) else []
+    yield from _iter_chunk_texts(chunks, done)
+    
+    print(f"    Duration: {total_samples/ASR_SAMPLE_RATE:.1f}s, {done + len(chunks)} chunks")
+
+
+def _iter_chunk_texts(chunks: list, done: int = 0, total: Optional[int] = None):
+    """
+    Yield transcripts of chunks in order / 按顺序产出各分段的转录文本
+    
+    Chunks are decoded ASR_BATCH_SIZE at a time in one padded FunASR call;
+    batches run one after another, since a single call already uses every
+    torch thread and the shared model is not re-entrant. `done` numbers the
+    progress lines after chunks already transcribed.
+    每 ASR_BATCH_SIZE 个分段在一次 FunASR 调用中批量解码；批次依次执行，
+    因为单次调用已占用全部 torch 线程，且共享模型不可重入。`done` 为已转录的分段数，用于进度编号。
+    """
+    if not chunks:
+        return
+    
+    model = get_asr_model()
+    
+    for i in range(0, len(chunks), ASR_BATCH_SIZE):
+        for text in _generate_texts(model, chunks[i:i + ASR_BATCH_SIZE]):
+            done += 1
+            label = f"{done}/{total}" if total else f"{done}"
+            print(f"    Chunk {label}: {len(text)} chars" if text
+                  else f"    Chunk {label}: no result", flush=True)
+            if text:
+                yield text
+
+
+def write_transcript(output_file: Path, title: str, texts) -> int:
+    """
+    Write transcript pieces to Markdown as they arrive / 转录文本片段到达即写入Markdown
+    
+    Nothing is accumulated in memory, and text already written survives a
+    failure later in a long file. Returns the transcript length.
+    不在内存中累积文本，长文件后续失败时已写入的内容仍会保留。返回转录文本长度。
+    """
+    length = 0
+    with open(output_file, "w", encoding="utf-8") as out:
+        out.write(f"# {title}\n\n")
+        for text in texts:
+            out.write(text)
+            out.flush()
+            length += len(text)
+    return length
+
+
+def pcm16_to_float32(raw: bytes):
+    """
+    Convert s16le PCM bytes to float32 in [-1, 1) / 将 s16le PCM 字节转换为 [-1, 1) 区间的 float32
+    
+    The int16 buffer is a zero-copy view and the scaled float32 array is the
+    only allocation (astype() followed by / would allocate twice). 1/32768 is
+    a power of two, so the result matches dividing exactly.
+    int16 缓冲区为零拷贝视图，缩放后的 float32 数组是唯一的分配（astype() 后再除会分配两次）；
+    1/32768 为2的幂，结果与除法完全一致。
+    """
+    import numpy as np
+    
+    return np.multiply(np.frombuffer(raw, dtype=np.int16), np.float32(1 / 32768), dtype=np.float32)
+
+
+def extract_audio_samples(path: Path):
+    """
+    Decode the audio track to 16kHz mono float32 via an ffmpeg pipe
+    通过 ffmpeg 管道将音轨解码为 16kHz 单声道 float32
+    """
+    import subprocess
+    
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", str(path),
+        "-vn", "-f", "s16le", "-ac", "1", "-ar", str(ASR_SAMPLE_RATE), "-",
+    ]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {proc.stderr.decode(errors='replace').strip()}")
+    
+    return pcm16_to_float32(proc.stdout)
+
+
+def stream_audio_samples(path: Path, block_sec: int = AUDIO_STREAM_BLOCK_SEC):
+    """
+    Yield 16kHz mono float32 blocks while ffmpeg is still decoding / 在 ffmpeg 解码的同时逐块产出16kHz单声道float32数据
+    
+    A producer thread reads the ffmpeg pipe into a bounded queue (at most two
+    blocks ahead), so decoding overlaps with transcribing earlier blocks.
+    生产者线程将 ffmpeg 管道读入有界队列（最多提前两个块），解码与前面块的转录重叠进行。
+    
+    stderr goes to a temporary file: an unread stderr pipe fills up on a
+    chatty decoder and stalls ffmpeg, and with it the stdout reader.
+    stderr 写入临时文件：未读取的 stderr 管道在解码器输出较多时会写满，使 ffmpeg
+    及 stdout 读取一同停滞。
+    """
+    import queue
+    import subprocess
     import tempfile
     
-    print("    Loading audio file...", flush=True)
-    audio = AudioSegment.from_file(str(path))
-    duration_ms = len(audio)
-    chunk_ms = chunk_sec * 1000
-    num_chunks = (duration_ms + chunk_ms - 1) // chunk_ms
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", str(path),
+        "-vn", "-f", "s16le", "-ac", "1", "-ar", str(ASR_SAMPLE_RATE), "-",
+    ]
+    errors = tempfile.TemporaryFile()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors)
+    blocks = queue.Queue(maxsize=2)
+    block_bytes = block_sec * ASR_SAMPLE_RATE * 2
     
-    print(f"    Duration: {duration_ms/1000:.1f}s, {num_chunks} chunks")
+    def produce():
+        try:
+            for raw in iter(lambda: proc.stdout.read(block_bytes), b""):
+                blocks.put(raw)
+        finally:
+            blocks.put(None)
     
-    print("    Loading ASR model...", flush=True)
-    model = AutoModel(model="paraformer-zh", device="cpu", disable_update=True)
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        for raw in iter(blocks.get, None):
+            yield pcm16_to_float32(raw)
+        if proc.wait() != 0:
+            errors.seek(0)
+            raise RuntimeError(f"ffmpeg failed: {errors.read().decode(errors='replace').strip()}")
+    finally:
+        # The consumer may stop early (error or close()): kill ffmpeg so the
+        # pipe hits EOF, and drain the queue so the producer is never left
+        # blocked on a full queue; then reap ffmpeg and close its outputs.
+        # 消费者可能提前停止（异常或 close()）：终止 ffmpeg 使管道到达 EOF，并清空队列，
+        # 避免生产者阻塞在已满的队列上；随后回收 ffmpeg 进程并关闭其输出。
+        if proc.poll() is None:
+            proc.kill()
+        while producer.is_alive():
+            try:
+                blocks.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        proc.wait()
+        proc.stdout.close()
+        errors.close()
+
+
+def load_audio_samples(path: Path):
+    """
+    Decode audio to 16kHz mono float32 samples / 将音频解码为16kHz单声道float32采样
     
-    all_text = []
+    Resampling and down-mixing happen once here, so the ASR model never sees
+    44.1/48kHz stereo input. ffmpeg streams PCM straight into numpy; pydub is
+    only used when ffmpeg is not on PATH (it can still read WAV then).
+    在此一次完成重采样和混音，ASR 模型不再接收 44.1/48kHz 立体声输入。ffmpeg 直接将 PCM
+    流式写入 numpy；仅在 PATH 中没有 ffmpeg 时使用 pydub（此时仍可读取 WAV）。
+    """
+    print("    Loading audio file...", flush=True)
+    if shutil.which("ffmpeg"):
+        return extract_audio_samples(path)
     
-    with tempfile.TemporaryDirectory() as temp_dir:
-        for i, start in enumerate(range(0, duration_ms, chunk_ms)):
-            end = min(start + chunk_ms, duration_ms)
-            chunk = audio[start:end]
-            chunk_path = Path(temp_dir) / f"chunk_{i}.wav"
-            chunk.export(str(chunk_path), format="wav")
-            
-            print(f"    Processing chunk {i+1}/{num_chunks}...", end="", flush=True)
-            result = model.generate(input=str(chunk_path))
-            if result and len(result) > 0:
-                text = result[0].get("text", "")
-                all_text.append(text)
-                print(f" {len(text)} chars")
-            else:
-                print(" no result")
+    from pydub import AudioSegment
+    
+    audio = AudioSegment.from_file(str(path))
+    audio = audio.set_frame_rate(ASR_SAMPLE_RATE).set_channels(1).set_sample_width(2)
+    
+    return pcm16_to_float32(audio.raw_data)
+
+
+def process_audio_direct(path: Path) -> str:
+    """Process audio directly / 直接处理音频"""
+    return transcribe_direct(load_audio_samples(path))
+
+
+def iter_audio_chunked(path: Path, chunk_sec: int = AUDIO_CHUNK_DURATION_SEC):
+    """Yield chunk transcripts of a large audio file in order / 按顺序产出大音频文件的分段转录文本"""
+    if shutil.which("ffmpeg"):
+        print("    Streaming audio file...", flush=True)
+        with closing(stream_audio_samples(path)) as blocks:
+            yield from iter_stream_transcript(blocks, chunk_sec)
+        return
     
-    return "".join(all_text)
+    # Decode once to float32 and slice in memory instead of exporting WAV chunks
+    # 一次解码为 float32，在内存中切片，不再导出 WAV 分段
+    yield from iter_transcript(load_audio_samples(path), chunk_sec)
 
 
 def process_audio(path: Path, output_dir: Path) -> ProcessResult:
@@ -242,23 +738,21 @@ def process_audio(path: Path, output_dir: Path) -> ProcessResult:
         
         if file_size_mb > AUDIO_SIZE_THRESHOLD_MB:
             print(f"    Large file ({file_size_mb:.1f}MB), using chunked processing")
-            text = process_audio_chunked(path)
+            texts = iter_audio_chunked(path)
             result.strategy = "audio_chunked"
         else:
             print(f"    Small file ({file_size_mb:.1f}MB), direct processing")
-            text = process_audio_direct(path)
+            texts = [process_audio_direct(path)]
             result.strategy = "audio_direct"
         
         output_file = output_dir / f"{path.stem}.md"
-        output_file.write_text(f"# {path.name}\n\n{text}", encoding="utf-8")
+        result.text_length = write_transcript(output_file, path.name, texts)
         
         result.success = True
         result.output_path = str(output_file)
-        result.text_length = len(text)
         
     except Exception as e:
-        result.error = str(e)
-        traceback.print_exc()
+        record_error(result, e)
     
     return result
 
@@ -268,38 +762,28 @@ def process_video(path: Path, output_dir: Path) -> ProcessResult:
     result = ProcessResult(file_path=str(path), file_type="video")
     
     try:
-        import tempfile
-        from pydub import AudioSegment
-        
         print("    Extracting audio...", flush=True)
+        samples = extract_audio_samples(path)
         
-        audio = AudioSegment.from_file(str(path))
-        
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-            tmp_path = Path(tmp.name)
-            audio.export(str(tmp_path), format="wav")
-        
-        file_size_mb = tmp_path.stat().st_size / (1024 * 1024)
+        # Same size rule as audio files, measured on the 16-bit PCM stream
+        # 与音频文件相同的大小阈值，按16位PCM数据计算
+        pcm_size_mb = samples.size * 2 / (1024 * 1024)
         
-        if file_size_mb > AUDIO_SIZE_THRESHOLD_MB:
-            text = process_audio_chunked(tmp_path)
+        if pcm_size_mb > AUDIO_SIZE_THRESHOLD_MB:
+            texts = iter_transcript(samples)
             result.strategy = "video_chunked"
         else:
-            text = process_audio_direct(tmp_path)
+            texts = [transcribe_direct(samples)]
             result.strategy = "video_direct"
         
-        tmp_path.unlink()
-        
         output_file = output_dir / f"{path.stem}.md"
-        output_file.write_text(f"# {path.name}\n\n{text}", encoding="utf-8")
+        result.text_length = write_transcript(output_file, path.name, texts)
         
         result.success = True
         result.output_path = str(output_file)
-        result.text_length = len(text)
         
     except Exception as e:
-        result.error = str(e)
-        traceback.print_exc()
+        record_error(result, e)
     
     return result
 
@@ -312,18 +796,14 @@ def process_image(path: Path, output_dir: Path) -> ProcessResult:
     
     try:
         import cv2
-        from rapidocr_onnxruntime import RapidOCR
         
-        ocr = RapidOCR()
+        ocr = init_ocr_engine()
+        if ocr is None:
+            raise ImportError("rapidocr_onnxruntime is not installed")
         img = cv2.imread(str(path))
         
         print("    OCR processing...", flush=True)
-        ocr_result = ocr(img)
-        
-        if ocr_result and ocr_result[0]:
-            text = "\n".join([item[1] for item in ocr_result[0]])
-        else:
-            text = ""
+        text = ocr_image(img, ocr)
         
         output_file = output_dir / f"{path.stem}.md"
         output_file.write_text(f"# {path.name}\n\n{text}", encoding="utf-8")
@@ -334,8 +814,7 @@ def process_image(path: Path, output_dir: Path) -> ProcessResult:
         result.text_length = len(text)
         
     except Exception as e:
-        result.error = str(e)
-        traceback.print_exc()
+        record_error(result, e)
     
     return result
 
@@ -370,7 +849,7 @@ def process_with_retry(path: Path, output_dir: Path, max_retries: int = MAX_RETR
                 break
                 
         except Exception as e:
-            result.error = f"{e}\n{traceback.format_exc()}"
+            record_error(result, e)
         
         if attempt < max_retries - 1 and not result.success:
             print(f"  [RETRY] Processing failed, retrying...")
@@ -379,6 +858,51 @@ def process_with_retry(path: Path, output_dir: Path, max_retries: int = MAX_RETR
     return result
 
 
+def append_log_lines(log_file: Path, entries: list):
+    """
+    Append JSON lines with a single O_APPEND write / 以单次 O_APPEND 写入追加多行JSON
+    
+    Concurrent runs sharing an output directory cannot interleave records,
+    since the lines reach the kernel as one write() at end of file.
+    共享输出目录的并发运行不会交错写入记录，这些行以一次 write() 写到文件末尾。
+    """
+    data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries).encode("utf-8")
+    fd = os.open(log_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+def append_log_line(log_file: Path, entry: dict):
+    """Append one JSON line / 追加一行JSON"""
+    append_log_lines(log_file, [entry])
+
+
+def migrate_legacy_log(legacy_file: Path, log_file: Path):
+    """
+    Convert the old JSON array log to JSONL once / 将旧版JSON数组日志一次性转换为JSONL
+    
+    The legacy file is first renamed to a name unique to this process; the
+    rename is atomic, so of several concurrent runs exactly one claims it and
+    the others see it gone (already migrated).
+    先将旧文件重命名为本进程独有的名称；重命名是原子操作，多个并发运行中只有一个能获得该文件，
+    其余视为已迁移。
+    """
+    claimed = legacy_file.with_name(f"{legacy_file.name}.{os.getpid()}.migrating")
+    try:
+        legacy_file.rename(claimed)
+    except FileNotFoundError:
+        return
+    try:
+        logs = json.loads(claimed.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        logs = []
+    if logs:
+        append_log_lines(log_file, logs)
+    claimed.unlink()
+
+
 def main(input_path: str, output_dir: str = "./output"):
     """Main function / 主函数"""
     path = Path(input_path).resolve()
@@ -416,16 +940,10 @@ def main(input_path: str, output_dir: str = "./output"):
         print(f"  Attempts: {result.attempts}")
     print(f"{'='*60}")
     
-    # Save processing log / 保存处理日志
-    log_file = output / "processing_log.json"
-    logs = []
-    if log_file.exists():
-        try:
-            logs = json.loads(log_file.read_text(encoding="utf-8"))
-        except:
-            logs = []
-    logs.append(asdict(result))
-    log_file.write_text(json.dumps(logs, ensure_ascii=False, indent=2), encoding="utf-8")
+    # Save processing log (append-only JSONL) / 保存处理日志（追加写入JSONL）
+    log_file = output / "processing_log.jsonl"
+    migrate_legacy_log(output / "processing_log.json", log_file)
+    append_log_line(log_file, asdict(result))
     
     return result
 
@@ -13,6 +13,7 @@ Usage / 用法:
     python run_e2e_test.py
 """
 
+import os
 import sys
 import time
 from pathlib import Path
@@ -30,12 +31,13 @@ def check_environment():
     print("\n[1/4] Checking environment / 检查环境...")
     
     # Check Python version / 检查Python版本
-    version = sys.version_info
-    if not (3 <= version.major and 10 <= version.minor <= 12):
-        print(f"  [X] Python {version.major}.{version.minor} not supported")
-        print(f"      Need Python 3.10-3.12")
+    from check_dependencies import check_python_version
+    
+    ok, status = check_python_version()
+    if not ok:
+        print(f"  [X] {status} not supported")
         return False
-    print(f"  [OK] Python {version.major}.{version.minor}.{version.micro}")
+    print(f"  [OK] {status}")
     
     # Check core dependencies / 检查核心依赖
     deps = [
@@ -71,14 +73,16 @@ def setup_environment():
 
 
 def find_test_files(test_dir: Path) -> list:
-    """Find test files / 查找测试文件"""
-    from process_file import FILE_TYPE_MAP
-    
-    files = []
-    for ext in FILE_TYPE_MAP.keys():
-        files.extend(test_dir.glob(f"*{ext}"))
-        files.extend(test_dir.glob(f"*{ext.upper()}"))
-    return sorted(set(files))
+    """Find test files in one directory pass / 单次遍历目录查找测试文件"""
+    from process_file import SUPPORTED_EXTENSIONS
+    
+    # Lower-casing the suffix covers .PDF/.Pdf on any filesystem without extra globs
+    # 扩展名转小写后即可在任意文件系统上匹配 .PDF/.Pdf，无需额外 glob
+    with os.scandir(test_dir) as entries:
+        return sorted(
+            Path(entry.path) for entry in entries
+            if os.path.splitext(entry.name)[1].lower() in SUPPORTED_EXTENSIONS and entry.is_file()
+        )
 
 
 def run_test(test_dir: Path, output_dir: Path) -> bool:
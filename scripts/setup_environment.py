@@ -10,24 +10,87 @@ Features / 功能:
 3. Verify installation / 验证安装
 4. Check FFmpeg / 检查FFmpeg
 
+Install strategy / 安装策略:
+    Each `python -m pip` call pays interpreter and pip start-up, so pip runs
+    once per package group (core, optional), never once per package.
+    Installed packages are skipped, so a warm run usually starts no pip
+    process at all. pip is always run as a subprocess: its internal API is
+    not supported for in-process or repeated use.
+    If `uv` is on PATH it installs each group instead (much faster resolve
+    and parallel downloads), falling back to pip if it fails. Set
+    DOCPIPE_DISABLE_UV=1 to always use pip.
+    每次 `python -m pip` 调用都有解释器和 pip 的启动开销，因此按包组（核心、可选）
+    各调用一次，而非每个包一次。已安装的包会被跳过，
+    环境未变化时通常不会启动任何 pip 进程。pip 始终以子进程运行：其内部 API
+    不支持在进程内或重复调用。
+    若 PATH 中有 `uv`，则改用 uv 安装各组（解析更快、并行下载），失败时回退到 pip；
+    设置 DOCPIPE_DISABLE_UV=1 可始终使用 pip。
+
 Usage / 用法:
     python setup_environment.py
 """
 
+import os
 import sys
+import time
+import random
+import tempfile
+import threading
+import importlib.util
 import subprocess
 import shutil
+from pathlib import Path
+from collections import deque
+
+# Package names, import names and checks are shared with check_dependencies
+# 包名、导入名及检查逻辑与 check_dependencies 共用
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+from check_dependencies import (
+    DEPENDENCY_LEVELS,
+    PYTHON_RANGE,
+    UNRECOVERABLE_PIP_ERRORS,
+    check_python_version as python_version_status
+)
+
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 1.0  # seconds, doubled per attempt / 秒，每次重试翻倍
+RETRY_MAX_DELAY = 30.0  # seconds / 秒
+
+# Options shared by every pip call, set once as PIP_* variables instead of
+# repeated flags: no PyPI self-version check, quiet, prefer wheels
+# 所有 pip 调用共用的选项，以 PIP_* 环境变量统一设置而非重复传参：
+# 跳过 PyPI 自身版本检查、安静输出、优先使用 wheel
+PIP_ENV = {
+    **os.environ,
+    "PIP_DISABLE_PIP_VERSION_CHECK": "1",
+    "PIP_QUIET": "1",
+    "PIP_PREFER_BINARY": "1",
+}
+
+# Optional fast installer, used instead of pip when found / 可选的快速安装器，存在时代替 pip
+UV_PATH = None if os.environ.get("DOCPIPE_DISABLE_UV") else shutil.which("uv")
+
+# Lines of pip output kept for error reports / 错误报告保留的 pip 输出行数
+PIP_OUTPUT_TAIL_LINES = 20
+
+# pip name -> import name / pip 包名 -> 导入名
+IMPORT_NAMES = {
+    pkg: info["import"]
+    for config in DEPENDENCY_LEVELS.values()
+    for pkg, info in config.get("packages", {}).items()
+}
 
 
 def check_python_version():
     """Check Python version / 检查Python版本"""
     print("\n[1/4] Checking Python version / 检查Python版本...")
     
-    version = sys.version_info
-    print(f"  Current: Python {version.major}.{version.minor}.{version.micro}")
+    ok, status = python_version_status()
+    print(f"  Current: {status}")
     
-    if version.major != 3 or not (10 <= version.minor <= 12):
-        print(f"  [X] Python 3.10-3.12 required")
+    if not ok:
+        print(f"  [X] Python {PYTHON_RANGE} required")
         print(f"      Please install a compatible Python version")
         return False
     
@@ -35,6 +98,174 @@ def check_python_version():
     return True
 
 
+def module_available(import_name: str) -> bool:
+    """
+    Check whether a module can be found, without executing it / 检查模块是否存在，但不执行它
+    
+    Only availability is checked; a real import (and any runtime error
+    inside the module) still happens when the module is used.
+    仅检查可用性；真正的导入（及模块内部的运行时错误）在实际使用时发生。
+    """
+    try:
+        return importlib.util.find_spec(import_name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def is_installed(package: str) -> bool:
+    """Check whether a pip package is already installed / 检查 pip 包是否已安装"""
+    return module_available(IMPORT_NAMES.get(package, package.replace("-", "_")))
+
+
+def stream_pip(cmd: list, timeout: float):
+    """
+    Run pip, keeping only the tail of its output / 运行 pip，仅保留输出末尾
+    
+    Output is read line by line and all but the last PIP_OUTPUT_TAIL_LINES
+    lines are dropped, instead of buffering everything pip prints.
+    The timeout kills pip even while it is silent.
+    Returns (returncode, tail text).
+    逐行读取输出，仅保留最后 PIP_OUTPUT_TAIL_LINES 行，不缓存全部输出；
+    pip 无输出时超时同样生效。返回 (返回码, 输出末尾)。
+    """
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        errors="replace",
+        bufsize=1,
+        env=PIP_ENV
+    )
+    timer = threading.Timer(timeout, proc.kill)
+    timer.start()
+    try:
+        with proc.stdout:
+            tail = deque((line.rstrip() for line in proc.stdout), maxlen=PIP_OUTPUT_TAIL_LINES)
+        proc.wait()
+    finally:
+        timed_out = timer.finished.is_set()
+        timer.cancel()
+    
+    if timed_out:
+        tail.append(f"pip timed out after {timeout:.0f}s / pip 超时")
+    return proc.returncode, "\n".join(tail)
+
+
+def run_pip_install(packages: list, retries: int = MAX_RETRIES, find_links: str = None,
+                    only_binary: list = None):
+    """
+    Run a single pip install for all packages, returning (ok, error) / 单次 pip install 安装所有包，返回 (是否成功, 错误)
+    
+    Transient failures are retried with exponential backoff and jitter; errors
+    that no retry can fix (unknown package, bad requirement) return at once.
+    临时失败以指数退避加随机抖动重试；重试无法解决的错误（包不存在、需求格式错误）立即返回。
+    """
+    error = ""
+    for attempt in range(retries):
+        cmd = [sys.executable, "-m", "pip", "install", *packages]
+        if find_links:
+            cmd += ["--find-links", find_links]
+        if only_binary:
+            cmd += ["--only-binary", ",".join(only_binary)]
+        try:
+            returncode, error = stream_pip(cmd, timeout=300 * len(packages))
+            if returncode == 0:
+                return True, ""
+        except Exception as e:
+            error = str(e)
+        
+        if any(marker in error for marker in UNRECOVERABLE_PIP_ERRORS) or attempt == retries - 1:
+            break
+        time.sleep(min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt * (0.5 + random.random())))
+    
+    return False, error
+
+
+def install_wheels_first(packages: list, find_links: str = None):
+    """
+    Install with pip's normal resolver, wheels first, returning (ok, error) / 使用 pip 正常解析安装，优先 wheel，返回 (是否成功, 错误)
+    
+    The requested packages must install from wheels, so pymupdf/psutil/opencv
+    are never built from source (minutes with a compiler, or a failure
+    without one). Only if no wheel exists is the install retried with sdists
+    allowed. Transitive pure-Python sdists such as jieba install normally.
+    所请求的包必须使用 wheel 安装，不会从源码编译 pymupdf/psutil/opencv；
+    仅在没有可用 wheel 时才允许源码包重试。jieba 等纯 Python 的传递依赖源码包正常安装。
+    """
+    ok, error = run_pip_install(packages, find_links=find_links, only_binary=packages)
+    no_wheel = ("No matching distribution", "Could not find a version")
+    if ok or not any(marker in error for marker in no_wheel):
+        return ok, error
+    return run_pip_install(packages, find_links=find_links)
+
+
+def run_uv_install(packages: list, find_links: str = None):
+    """
+    Install with `uv pip install` into this interpreter, returning (ok, error) / 使用 uv 安装到当前解释器，返回 (是否成功, 错误)
+    
+    No retries here: any failure falls back to the pip path, which retries.
+    此处不重试：失败时回退到带重试的 pip 安装。
+    """
+    cmd = [UV_PATH, "pip", "install", "--python", sys.executable, "-q", *packages]
+    if find_links:
+        cmd += ["--find-links", find_links]
+    try:
+        returncode, error = stream_pip(cmd, timeout=300 * len(packages))
+    except Exception as e:
+        return False, str(e)
+    return returncode == 0, error
+
+
+def prefetch_packages(packages: list, dest: str) -> subprocess.Popen:
+    """
+    Start downloading wheels in the background / 后台开始下载 wheel
+    
+    Only downloads run concurrently: two pip installs writing the same
+    site-packages (e.g. both pulling numpy) can corrupt it.
+    仅下载并行执行：两个 pip install 同时写入同一 site-packages（如都依赖 numpy）可能导致损坏。
+    """
+    return subprocess.Popen(
+        [sys.executable, "-m", "pip", "download", *packages, "-d", dest],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env=PIP_ENV
+    )
+
+
+def install_packages(packages: list, required: bool = True, find_links: str = None) -> dict:
+    """
+    Install packages in one pip call, one by one if that fails / 单次 pip 调用批量安装，失败时逐个安装
+    
+    pip is all-or-nothing, so a failed batch is retried per package to tell
+    which ones actually failed. Returns {package: error or None}.
+    pip 批量安装要么全成功要么全失败，失败时逐个重试以确定具体失败的包。返回 {包名: 错误或None}。
+    """
+    print(f"  Installing {', '.join(packages)}...", end="", flush=True)
+    ok = False
+    if UV_PATH:
+        ok, error = run_uv_install(packages, find_links)
+    if not ok:
+        ok, error = install_wheels_first(packages, find_links)
+    
+    if ok:
+        print(" [OK]")
+        return dict.fromkeys(packages)
+    
+    if len(packages) == 1:
+        print(" [X]" if required else " [SKIP]")
+        if required:
+            for line in error.splitlines():
+                print(f"      {line}")
+        return {packages[0]: error or "install failed"}
+    
+    print(" [X] batch failed, installing one by one / 批量安装失败，逐个安装")
+    results = {}
+    for pkg in packages:
+        results.update(install_packages([pkg], required, find_links))
+    return results
+
+
 def install_dependencies():
     """Install Python dependencies / 安装Python依赖"""
     print("\n[2/4] Installing dependencies / 安装依赖...")
@@ -52,38 +283,43 @@ def install_dependencies():
         ("opencv-python-headless", "Image processing"),
     ]
     
-    # Install core packages / 安装核心包
-    for pkg in packages:
-        print(f"  Installing {pkg}...", end="", flush=True)
-        try:
-            result = subprocess.run(
-                [sys.executable, "-m", "pip", "install", pkg, "-q"],
-                capture_output=True,
-                timeout=300
-            )
-            if result.returncode == 0:
-                print(" [OK]")
-            else:
-                print(f" [X] {result.stderr.decode()[:100]}")
-        except Exception as e:
-            print(f" [X] {e}")
+    # Already-installed packages skip pip entirely / 已安装的包完全跳过 pip
+    skipped = [pkg for pkg in packages + [pkg for pkg, _ in optional_packages] if is_installed(pkg)]
+    packages = [pkg for pkg in packages if pkg not in skipped]
+    optional_names = [pkg for pkg, _ in optional_packages if pkg not in skipped]
     
-    # Install optional packages / 安装可选包
-    print("\n  Installing optional packages / 安装可选包...")
-    for pkg, desc in optional_packages:
-        print(f"  Installing {pkg} ({desc})...", end="", flush=True)
-        try:
-            result = subprocess.run(
-                [sys.executable, "-m", "pip", "install", pkg, "-q"],
-                capture_output=True,
-                timeout=300
-            )
-            if result.returncode == 0:
-                print(" [OK]")
-            else:
-                print(f" [SKIP]")
-        except Exception as e:
-            print(f" [SKIP]")
+    with tempfile.TemporaryDirectory() as wheel_dir:
+        # Optional wheels download while the core group installs; uv
+        # already downloads in parallel
+        # 安装核心包的同时下载可选包的 wheel；uv 本身已并行下载
+        prefetch = prefetch_packages(optional_names, wheel_dir) if optional_names and not UV_PATH else None
+        
+        # One pip run per group resolves and downloads everything together
+        # 每组一次 pip 调用，统一解析和下载
+        if packages:
+            install_packages(packages, required=True)
+        
+        # Install optional packages / 安装可选包
+        if optional_names:
+            print("\n  Installing optional packages / 安装可选包...")
+            for pkg, desc in optional_packages:
+                if pkg in optional_names:
+                    print(f"    {pkg}: {desc}")
+            find_links = wheel_dir if prefetch else None
+            if prefetch:
+                # A stalled download must not hang setup; pip fetches
+                # whatever is missing itself
+                # 下载卡住时不能阻塞配置；缺少的包由 pip 自行下载
+                try:
+                    prefetch.wait(timeout=300 * len(optional_names))
+                except subprocess.TimeoutExpired:
+                    prefetch.kill()
+                    prefetch.wait()
+                    find_links = None
+            install_packages(optional_names, required=False, find_links=find_links)
+    
+    if skipped:
+        print(f"\n  [SKIP] Already installed / 已安装: {', '.join(skipped)}")
     
     return True
 
@@ -93,33 +329,36 @@ def verify_installation():
     print("\n[3/4] Verifying installation / 验证安装...")
     
     core_deps = [
-        ("fitz", "PyMuPDF"),
-        ("pydub", "pydub"),
-        ("funasr", "FunASR"),
-        ("modelscope", "ModelScope"),
-        ("psutil", "psutil"),
+        (IMPORT_NAMES["pymupdf"], "PyMuPDF"),
+        (IMPORT_NAMES["pydub"], "pydub"),
+        (IMPORT_NAMES["funasr"], "FunASR"),
+        (IMPORT_NAMES["modelscope"], "ModelScope"),
+        (IMPORT_NAMES["psutil"], "psutil"),
     ]
     
     optional_deps = [
-        ("rapidocr_onnxruntime", "RapidOCR"),
-        ("cv2", "OpenCV"),
+        (IMPORT_NAMES["rapidocr-onnxruntime"], "RapidOCR"),
+        (IMPORT_NAMES["opencv-python-headless"], "OpenCV"),
     ]
     
+    # Modules are located with find_spec rather than imported, so funasr and
+    # modelscope do not load torch here. That keeps every run cheap, so no
+    # result cache is kept (it could go stale after a pip install/uninstall)
+    # 使用 find_spec 定位模块而非导入，funasr/modelscope 不会在此加载 torch；
+    # 每次运行都很快，因此不缓存结果（pip 安装/卸载后缓存可能过期）
     all_ok = True
     
     for import_name, display_name in core_deps:
-        try:
-            __import__(import_name)
+        if module_available(import_name):
             print(f"  [OK] {display_name}")
-        except ImportError:
+        else:
             print(f"  [X] {display_name} - REQUIRED")
             all_ok = False
     
     for import_name, display_name in optional_deps:
-        try:
-            __import__(import_name)
+        if module_available(import_name):
             print(f"  [OK] {display_name} (optional)")
-        except ImportError:
+        else:
             print(f"  [--] {display_name} (optional, not installed)")
     
     return all_ok